@@ -11,8 +11,12 @@ setup(
     install_requires=[
         'requests',
         'keyring',
-        'pandas'
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'milestones': ['pandas'],
+        'yaml': ['PyYAML'],
+    },
     classifiers=[
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
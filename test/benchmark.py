@@ -0,0 +1,109 @@
+"""Benchmarks `sync` end to end against `fake_api.FakeApi`, reporting the requests made, bytes
+transferred, wall time and peak memory of a cold run (empty caches) followed by warm runs.
+
+    python test/benchmark.py
+    python test/benchmark.py --entries 1000 --issues 100 --runs 3 --summary
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(1, str(Path(__file__).parent.parent))
+
+from fake_api import GH_PROJECT_NUMBER, TOGGL_PROJECT_NAME, FakeApi, Workspace  # noqa: E402
+from fake_api import use_fake_api  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCENARIOS = [(1000, 100), (10000, 1000), (100000, 5000)]
+
+
+def run_sync(url: str, cache_dir: str, summary: bool) -> Dict[str, float]:
+    """Runs `sync` once against the fake api. Runs in a fresh process so its peak memory is its
+    own."""
+    from toggl2github.toggl2github import sync
+
+    if resource is None:
+        tracemalloc.start()
+
+    with use_fake_api(url, cache_dir):
+        start = time.perf_counter()
+        sync(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER, summary=summary)
+        wall_time = time.perf_counter() - start
+
+    if resource is None:
+        peak = tracemalloc.get_traced_memory()[1]
+    else:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == 'darwin' else 1024
+
+    return {'wall_time': wall_time, 'peak_memory': peak}
+
+
+def benchmark(n_entries: int, n_issues: int, runs=2, summary=False) -> List[Dict[str, Any]]:
+    workspace = Workspace.generate(n_entries, n_issues)
+    results = []
+
+    with FakeApi(workspace) as api, TemporaryDirectory() as cache_dir:
+        for i_run in range(runs):
+            before = dict(api.stats)
+
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_sync, api.url, cache_dir, summary).result()
+
+            results.append({'entries': n_entries,
+                            'issues': n_issues,
+                            'run': 'cold' if i_run == 0 else 'warm',
+                            'requests': api.stats['requests'] - before['requests'],
+                            'bytes': (api.stats['bytes_received'] + api.stats['bytes_sent']
+                                      - before['bytes_received'] - before['bytes_sent']),
+                            **result})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', help='Numbers of Toggl time entries', type=int, nargs='+',
+                        default=[e for e, _ in SCENARIOS])
+    parser.add_argument('--issues', help='Numbers of Github issues, one per number of entries',
+                        type=int, nargs='+', default=[i for _, i in SCENARIOS])
+    parser.add_argument('--runs', help='Runs per scenario, the first with empty caches',
+                        type=int, default=2)
+    parser.add_argument('--summary', help='Sync from the Toggl summary report',
+                        action='store_true')
+    parser.add_argument('--json', help='Write the results to this file as JSON', type=Path)
+    args = parser.parse_args()
+
+    if len(args.entries) != len(args.issues):
+        parser.error('--entries and --issues must have the same number of values')
+
+    print(f'{"entries":>8} {"issues":>7} {"run":>5} {"requests":>9} {"MB":>8} '
+          f'{"wall s":>7} {"peak MB":>8}')
+
+    results = []
+    for n_entries, n_issues in zip(args.entries, args.issues):
+        for r in benchmark(n_entries, n_issues, args.runs, args.summary):
+            print(f'{r["entries"]:>8} {r["issues"]:>7} {r["run"]:>5} {r["requests"]:>9} '
+                  f'{r["bytes"] / 2**20:>8.2f} {r["wall_time"]:>7.2f} '
+                  f'{r["peak_memory"] / 2**20:>8.1f}')
+            results.append(r)
+
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""An offline stand-in for the parts of the Toggl (v9 and Reports v3) and Github (ProjectV2
+GraphQL and REST) apis that toggl2github uses, serving a synthetic `Workspace`. Used by the end to
+end tests and `benchmark.py`."""
+import hashlib
+import json
+import random
+import re
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+from unittest.mock import patch
+
+WORKSPACE_ID = 1
+TOGGL_USER = 'tuser'
+TOGGL_PROJECT_ID = 100
+TOGGL_PROJECT_NAME = 'Benchmark'
+GH_USER = 'ghuser'
+GH_TOKEN = 'token'
+GH_PROJECT_NUMBER = 1
+GH_PROJECT_ID = 'PVT_1'
+GH_REPO = 'repo'
+RATE_LIMIT = 5000
+
+CONFIG = {'toggl_workspace_id': WORKSPACE_ID,
+          'toggl_user': TOGGL_USER,
+          'toggl_password': 'password',
+          'gh_user': GH_USER,
+          'gh_token': GH_TOKEN}
+
+FIELDS = [{'id': 'PVTF_title', 'name': 'Title'},
+          {'id': 'PVTF_time', 'name': 'Time Spent'},
+          {'id': 'PVTF_status', 'name': 'Status',
+           'options': [{'id': 'todo', 'name': 'Todo'}, {'id': 'done', 'name': 'Done'}]}]
+
+RE_NODE_ID = re.compile(r'user\(login: "([^"]+)"\)\s*\{\s*projectV2\(number: (\d+)\)')
+RE_FIELDS = re.compile(r'fields\(first: (\d+)\)')
+RE_ITEMS = re.compile(r'items\(first: (\d+), after: (null|"[^"]*")\)')
+RE_FIELD_VALUES = re.compile(r'fieldValues\(first: (\d+), after: (null|"[^"]*")\)')
+RE_NODE = re.compile(r'node\(id: "([^"]+)"\)')
+RE_MUTATION = re.compile(r'(\w+): updateProjectV2ItemFieldValue\(\s*input: \{\s*'
+                         r'projectId: "([^"]+)"\s*itemId: "([^"]+)"\s*fieldId: "([^"]+)"\s*'
+                         r'value: \{\s*(\w+): (.+?)\s*\}\s*\}\)')
+
+
+class Workspace:
+    """The Toggl time entries and Github project items served by `FakeApi`."""
+
+    def __init__(self, entries: List[Dict[str, Any]], issues: List[Dict[str, Any]],
+                 milestones: List[Dict[str, Any]] = None,
+                 repos: Dict[str, List[Dict[str, Any]]] = None):
+        self.entries = sorted(entries, key=lambda e: e['start'])
+        self.starts = [e['start'][:10] for e in self.entries]
+        self.issues = {i['id']: i for i in issues}
+        self.item_ids = list(self.issues)
+        self.milestones = milestones or []
+        self.repos = {GH_REPO: self.milestones, **(repos or {})}
+
+    def __repr__(self) -> str:
+        return f'<Workspace>: {len(self.entries)} entries | {len(self.issues)} issues'
+
+    @classmethod
+    def generate(cls, n_entries: int, n_issues: int, years=2, n_milestones=10, n_repos=1, seed=0):
+        """A workspace of `n_entries` time entries spread over `years` years, one task per issue,
+        a project of `n_issues` issues assigned to `GH_USER` and `n_repos` repos with
+        `n_milestones` milestones each, every other one completed."""
+        rng = random.Random(seed)
+        first = datetime(2024, 1, 1, tzinfo=timezone.utc) - timedelta(days=365 * (years - 1))
+        span = (datetime(2024, 12, 31, tzinfo=timezone.utc) - first).total_seconds()
+
+        entries = []
+        for i in range(n_entries):
+            number = i % n_issues + 1
+            start = first + timedelta(seconds=int(span * i / max(1, n_entries)))
+            stop = start + timedelta(minutes=rng.randint(15, 120))
+            entries.append({'id': 10**9 + i, 'project_id': TOGGL_PROJECT_ID, 'user_id': 1,
+                            'description': f'#{number} Issue {number}', 'billable': False,
+                            'start': start.isoformat(), 'stop': stop.isoformat(),
+                            'seconds': int((stop - start).total_seconds()),
+                            'at': stop.isoformat()})
+
+        issues = [{'id': f'PVTI_{n}', 'number': n, 'title': f'Issue {n}',
+                   'assignees': [GH_USER], 'values': {}}
+                  for n in range(1, n_issues + 1)]
+
+        def milestones():
+            return [{'title': f'Milestone {n}', 'description': '', 'number': n,
+                     'state': 'open', 'created_at': first.isoformat(),
+                     'updated_at': first.isoformat(), 'open_issues': n % 2,
+                     'closed_issues': 1}
+                    for n in range(1, n_milestones + 1)]
+
+        return cls(entries, issues, milestones(),
+                   {f'{GH_REPO}{i}': milestones() for i in range(2, n_repos + 1)})
+
+    def window(self, project_ids: List[int], start: str, end: str) -> List[Dict[str, Any]]:
+        """The entries of `project_ids` that start between `start` and `end` (inclusive)."""
+        (lo, hi) = (bisect_left(self.starts, start), bisect_left(self.starts, end + '~'))
+        return [e for e in self.entries[lo:hi] if e['project_id'] in project_ids]
+
+    def item_node(self, issue: Dict[str, Any], first=100, after=None) -> Dict[str, Any]:
+        return {'id': issue['id'],
+                'fieldValues': self.field_values(issue, first, after),
+                'content': {'url': f'https://github.com/{GH_USER}/{GH_REPO}/issues/'
+                                   f'{issue["number"]}',
+                            'assignees': {'nodes': [{'login': a} for a in issue['assignees']]}}}
+
+    def field_values(self, issue: Dict[str, Any], first=100, after=None) -> Dict[str, Any]:
+        nodes = [{'text': issue['title'], 'field': {'name': 'Title'}}]
+        for name, value in issue['values'].items():
+            key = {'Time Spent': 'number', 'Status': 'name'}.get(name, 'text')
+            nodes.append({key: value, 'field': {'name': name}})
+        nodes.append({})
+
+        offset = int(after or 0)
+        page = nodes[offset:offset + first]
+        has_next_page = offset + first < len(nodes)
+        return {'pageInfo': {'hasNextPage': has_next_page,
+                             'endCursor': str(offset + first) if has_next_page else None},
+                'nodes': page}
+
+
+class FakeApi:
+    """Serves a `Workspace` over HTTP on a free local port. Use as a context manager, then point
+    toggl2github at it with `use_fake_api(api.url)`.
+
+    Github responses carry rate limit headers and fail with a 403 once `rate_limit` requests have
+    been made. REST responses carry ETags and a matching `If-None-Match` gets a 304, which doesn't
+    count against the rate limit. Requests and bytes are counted in `stats`.
+    """
+
+    def __init__(self, workspace: Workspace, rate_limit=RATE_LIMIT, host='127.0.0.1', port=0):
+        self.workspace = workspace
+        self.rate_limit = rate_limit
+        self.gh_requests = 0
+        self.stats = {'requests': 0, 'bytes_received': 0, 'bytes_sent': 0, 'routes': {}}
+        self.lock = Lock()
+        self.server = ThreadingHTTPServer((host, port), FakeApiHandler)
+        self.server.api = self
+
+    def __enter__(self) -> 'FakeApi':
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.server.server_address[0]}:{self.server.server_port}'
+
+    def count(self, route: str, bytes_received: int, bytes_sent: int):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_received'] += bytes_received
+            self.stats['bytes_sent'] += bytes_sent
+            self.stats['routes'][route] = self.stats['routes'].get(route, 0) + 1
+
+    def route(self, method: str, path: str, query: Dict[str, List[str]],
+              body: Any) -> Tuple[str, int, Any]:
+        """Returns the route name, status code and body of the response to a request."""
+        ws = self.workspace
+        reports = f'/reports/api/v3/workspace/{WORKSPACE_ID}'
+
+        if method == 'GET' and path == '/api/v9/me':
+            return 'toggl.me', 200, {'created_at': ws.entries[0]['start'] if ws.entries
+                                     else '2024-01-01T00:00:00+00:00'}
+
+        if method == 'GET' and path == f'/api/v9/workspaces/{WORKSPACE_ID}/projects':
+            return 'toggl.projects', 200, [{'id': TOGGL_PROJECT_ID, 'name': TOGGL_PROJECT_NAME,
+                                            'workspace_id': WORKSPACE_ID, 'active': True}]
+
+        if method == 'POST' and path == f'{reports}/search/time_entries':
+            entries = ws.window(body['project_ids'], body['start_date'], body['end_date'])
+            first_row = body.get('first_row_number', 1) - 1
+            return 'toggl.search', 200, [
+                {'user_id': e['user_id'], 'username': TOGGL_USER, 'project_id': e['project_id'],
+                 'task_id': None, 'billable': e['billable'], 'description': e['description'],
+                 'tag_ids': [], 'row_number': first_row + i + 1,
+                 'time_entries': [{k: e[k] for k in ('id', 'seconds', 'start', 'stop', 'at')}]}
+                for i, e in enumerate(entries[first_row:first_row + body.get('page_size', 50)])]
+
+        if method == 'POST' and path == f'{reports}/summary/time_entries':
+            groups: Dict[int, Dict[str, int]] = {}
+            for e in ws.window(body['project_ids'], body['start_date'], body['end_date']):
+                if body.get('description', '') in e['description']:
+                    group = groups.setdefault(e['project_id'], {})
+                    group[e['description']] = group.get(e['description'], 0) + e['seconds']
+            return 'toggl.summary', 200, {'groups': [
+                {'id': p_id, 'sub_groups': [{'title': t, 'seconds': s} for t, s in g.items()]}
+                for p_id, g in groups.items()]}
+
+        if method == 'POST' and path == '/graphql':
+            return self.graphql(body.get('query', ''))
+
+        if (match := re.fullmatch(rf'/repos/{GH_USER}/{GH_REPO}/issues/(\d+)', path)):
+            issue = next((i for i in ws.issues.values() if i['number'] == int(match.group(1))),
+                         None)
+            if issue is None:
+                return 'github.issue', 404, {'message': 'Not Found'}
+            return 'github.issue', 200, {'number': issue['number'], 'title': issue['title'],
+                                         'state': 'open',
+                                         'assignees': [{'login': a} for a in issue['assignees']]}
+
+        (per_page, page) = (int(query.get('per_page', [30])[0]), int(query.get('page', [1])[0]))
+        if method == 'GET' and path == f'/users/{GH_USER}':
+            return 'github.user', 200, {'login': GH_USER, 'type': 'User'}
+
+        if method == 'GET' and path == '/user/repos':
+            repos = [{'name': name, 'archived': False} for name in ws.repos]
+            return 'github.repos', 200, repos[(page - 1) * per_page:page * per_page]
+
+        if (method == 'GET'
+                and (match := re.fullmatch(rf'/repos/{GH_USER}/([^/]+)/milestones', path))
+                and match.group(1) in ws.repos):
+            state = query.get('state', ['open'])[0]
+            milestones = [m for m in ws.repos[match.group(1)] if state in ['all', m['state']]]
+            return 'github.milestones', 200, milestones[(page - 1) * per_page:page * per_page]
+
+        if (method == 'PATCH'
+                and (match := re.fullmatch(rf'/repos/{GH_USER}/([^/]+)/milestones/(\d+)', path))
+                and match.group(1) in ws.repos):
+            milestone = next((m for m in ws.repos[match.group(1)]
+                              if m['number'] == int(match.group(2))), None)
+            if milestone is None:
+                return 'github.milestone', 404, {'message': 'Not Found'}
+            milestone.update(body)
+            return 'github.milestone', 200, milestone
+
+        return 'unknown', 404, {'message': 'Not Found'}
+
+    def graphql(self, query: str) -> Tuple[str, int, Any]:
+        ws = self.workspace
+
+        if query.lstrip().startswith('mutation'):
+            data: Dict[str, Any] = {}
+            errors = []
+            for (alias, project_id, item_id, field_id, key, value) in RE_MUTATION.findall(query):
+                field = next((f for f in FIELDS if f['id'] == field_id), None)
+                if item_id not in ws.issues or project_id != GH_PROJECT_ID:
+                    data[alias] = None
+                    errors.append({'type': 'NOT_FOUND', 'path': [alias],
+                                   'message': f"Could not resolve to a node with the global id "
+                                              f"of '{item_id}'"})
+                elif field is None:
+                    data[alias] = None
+                    errors.append({'type': 'NOT_FOUND', 'path': [alias],
+                                   'message': f"The field {field_id} does not exist"})
+                else:
+                    ws.issues[item_id]['values'][field['name']] = json.loads(value)
+                    data[alias] = {'projectV2Item': {'id': item_id}}
+            return 'github.mutation', 200, {'data': data, **({'errors': errors} if errors else {})}
+
+        if (match := RE_NODE_ID.search(query)):
+            return 'github.project', 200, {'data': {'user': {'projectV2': {'id': GH_PROJECT_ID}}}}
+
+        if RE_FIELDS.search(query):
+            return 'github.fields', 200, {'data': {'node': {'fields': {'nodes': FIELDS}}}}
+
+        if (match := RE_ITEMS.search(query)):
+            (first, after) = (int(match.group(1)), json.loads(match.group(2)))
+            offset = int(after or 0)
+            item_ids = ws.item_ids[offset:offset + first]
+            has_next_page = offset + first < len(ws.item_ids)
+            (values_first, _) = RE_FIELD_VALUES.search(query).groups()
+            return 'github.items', 200, {'data': {'node': {'items': {
+                'pageInfo': {'hasNextPage': has_next_page,
+                             'endCursor': str(offset + first) if has_next_page else None},
+                'nodes': [ws.item_node(ws.issues[i], int(values_first)) for i in item_ids]}}}}
+
+        if (match := RE_NODE.search(query)) and (values := RE_FIELD_VALUES.search(query)):
+            issue = ws.issues[match.group(1)]
+            (first, after) = (int(values.group(1)), json.loads(values.group(2)))
+            return 'github.field_values', 200, {'data': {'node': {
+                'fieldValues': ws.field_values(issue, first, after)}}}
+
+        return 'github.unknown', 200, {'errors': [{'message': 'Unsupported query'}]}
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which Nagle's algorithm would hold back
+    disable_nagle_algorithm = True
+    server: ThreadingHTTPServer
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def do_PATCH(self):
+        self.handle_request()
+
+    def handle_request(self):
+        api: FakeApi = self.server.api
+        url = urlparse(self.path)
+        content = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if url.path == '/_stats':
+            self.respond(200, json.dumps(api.stats).encode())
+            return
+
+        (route, status, body) = api.route(self.command, url.path, parse_qs(url.query),
+                                          json.loads(content) if content else None)
+        response = json.dumps(body).encode()
+        headers = {}
+
+        if route.startswith('github'):
+            etag = '"' + hashlib.sha1(response).hexdigest() + '"'
+            if self.command == 'GET' and status == 200:
+                headers['ETag'] = etag
+
+            if 'ETag' in headers and self.headers.get('If-None-Match') == etag:
+                (status, response) = (304, b'')
+            else:
+                with api.lock:
+                    api.gh_requests += 1
+                    remaining = api.rate_limit - api.gh_requests
+                if remaining < 0:
+                    (status, response) = (403, b'{"message": "API rate limit exceeded"}')
+
+            headers.update({'X-RateLimit-Limit': str(api.rate_limit),
+                            'X-RateLimit-Remaining': str(max(0, api.rate_limit - api.gh_requests)),
+                            'X-RateLimit-Reset': str(int(time.time()) + 3600)})
+
+        api.count(route, len(content), len(response))
+        self.respond(status, response, headers)
+
+    def respond(self, status: int, content: bytes, headers: Dict[str, str] = None):
+        self.send_response(status)
+        for key, value in {'Content-Type': 'application/json', **(headers or {})}.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def get_config(keys: List[str]) -> Dict[str, Any]:
+    return {k: CONFIG[k] for k in keys}
+
+
+@contextmanager
+def use_fake_api(url: str, cache_dir: Path):
+    """Points toggl2github at a `FakeApi` running at `url`, with its config and caches replaced by
+    `CONFIG` and `cache_dir`."""
+    modules = ['toggl2github.toggl', 'toggl2github.toggl2github', 'toggl2github.githubpy',
+               'toggl2github.daemon', 'toggl2github.aio']
+
+    with ExitStack() as stack:
+        stack.enter_context(patch('toggl2github.toggl.API_ENDPOINT', f'{url}/api/v9'))
+        stack.enter_context(patch('toggl2github.toggl.REPORTS_ENDPOINT',
+                                  f'{url}/reports/api/v3'))
+        stack.enter_context(patch('toggl2github.githubpy.GH_GRAPHQL_URL', f'{url}/graphql'))
+        stack.enter_context(patch('toggl2github.githubpy.GH_REST_URL', url))
+        stack.enter_context(patch('toggl2github.config.CACHE_DIR', Path(cache_dir)))
+        for module in modules:
+            stack.enter_context(patch(f'{module}.get_config', get_config))
+        yield
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from toggl2github import aio
+
+Response = Tuple[int, Any]
+
+
+class FakeSession:
+    """Stands in for `aio.AsyncSession`, answering each request after `latency` seconds with the
+    next canned response for its url, or with `responses(json)` if `responses` is callable so
+    that concurrent requests don't depend on the order they are scheduled in."""
+
+    def __init__(self, responses: Union[Dict[str, List[Response]], Callable[[dict], Response]],
+                 latency=0):
+        self.responses = responses
+        self.latency = latency
+        self.requests = []
+
+    async def request(self, method, url, **kwargs) -> Tuple[int, Any]:
+        self.requests.append((method, url, kwargs))
+        await asyncio.sleep(self.latency)
+        if callable(self.responses):
+            return self.responses(kwargs.get('json'))
+        key = next(k for k in self.responses if url.endswith(k))
+        return self.responses[key].pop(0)
+
+
+def items_page(ids, end_cursor, has_next_page):
+    return (200, {'data': {'node': {'items': {
+        'pageInfo': {'hasNextPage': has_next_page, 'endCursor': end_cursor},
+        'nodes': [{'id': i,
+                   'fieldValues': {'pageInfo': {'hasNextPage': False, 'endCursor': None},
+                                   'nodes': [{'text': f'Title {i}', 'field': {'name': 'Title'}}]},
+                   'content': {'url': f'https://github.com/u/r/issues/{n}'}}
+                  for n, i in enumerate(ids)]
+    }}}})
+
+
+class TestAsyncGithub(unittest.IsolatedAsyncioTestCase):
+
+    async def test_get_project_issues_follows_cursor(self):
+        session = FakeSession({'graphql': [items_page(['I0', 'I1'], 'C1', True),
+                                           items_page(['I2'], 'C2', False)]})
+
+        issues = await aio.get_project_issues(session, 'P1', page_size=2)
+
+        self.assertEqual([i['id'] for i in issues], ['I0', 'I1', 'I2'])
+        self.assertIn('after: "C1"', session.requests[1][2]['json']['query'])
+
+    async def test_set_field_values_sends_chunks_concurrently(self):
+        def respond(payload: dict) -> Tuple[int, Any]:
+            if 'u4:' in payload['query']:
+                return 502, 'Bad Gateway'
+            elif 'u2:' in payload['query']:
+                return 200, {'errors': [{'path': ['u2'], 'message': 'Bad'}]}
+            return 200, {'data': {}}
+
+        session = FakeSession(respond, latency=0.1)
+        updates = [(f'I{i}', 'Time Spent', 'number', i) for i in range(5)]
+
+        start = time.perf_counter()
+        errors = await aio.set_field_values(session, 'P1', {'time spent': 'F1'}, updates,
+                                            chunk_size=2)
+
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertEqual(errors[:2], [None, None])
+        self.assertEqual(errors[2], 'Bad')
+        self.assertEqual(errors[4], 'Request failed with status code 502')
+
+
+class TestAsyncToggl(unittest.IsolatedAsyncioTestCase):
+
+    async def test_years_are_fetched_concurrently(self):
+        def page(i):
+            return [{'description': '#1 Task',
+                     'time_entries': [{'id': i,
+                                       'start': '2020-01-01T00:00:00+00:00',
+                                       'stop': '2020-01-01T01:00:00+00:00'}]}]
+
+        # Each year has one entry, then an empty page ends it
+        def respond(body: dict) -> Tuple[int, Any]:
+            year = int(body['start_date'][:4])
+            return 200, page(year - 2020) if body['first_row_number'] == 1 else []
+
+        session = FakeSession(respond, latency=0.1)
+
+        start = time.perf_counter()
+        records = await aio.get_records(session, 1, [2], aio.date(2020, 1, 1),
+                                        aio.date(2024, 12, 31))
+
+        # Each year takes two requests, so sequentially this would take at least 1s
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(sorted(r['id'] for r in records), [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
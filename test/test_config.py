@@ -2,11 +2,12 @@ import sys
 import unittest
 from pathlib import Path
 import json
+import os
 from tempfile import gettempdir
 from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from toggl2github.config import set_config, get_config  # noqa
+from toggl2github.config import set_config, get_config, clear_cache  # noqa
 from toggl2github.config import CONFIG_FILE as ORIG_CONFIG_FILE  # noqa
 
 CONFIG_FILE = Path(gettempdir()) / ORIG_CONFIG_FILE.name
@@ -20,7 +21,7 @@ class TestSetConfig(unittest.TestCase):
         if CONFIG_FILE.exists():
             CONFIG_FILE.unlink()
 
-    @patch('toggl2github.config.keyring.set_password')
+    @patch('keyring.set_password')
     @patch('toggl2github.config.CONFIG_FILE', CONFIG_FILE)
     def test_set_config_with_password(self, mock_set_password: MagicMock):
 
@@ -37,7 +38,7 @@ class TestSetConfig(unittest.TestCase):
         self.assertDictEqual({k: v for k, v in kwargs.items() if 'password' not in k},
                              json.loads(CONFIG_FILE.read_text()))
 
-    @patch('toggl2github.config.keyring.set_password')
+    @patch('keyring.set_password')
     @patch('toggl2github.config.CONFIG_FILE', CONFIG_FILE)
     def test_set_config_without_password(self, mock_set_password: MagicMock):
         kwargs = {
@@ -83,3 +84,50 @@ class TestGetConfig(unittest.TestCase):
 
         if CONFIG_FILE.exists():
             CONFIG_FILE.unlink()
+
+
+class TestConfigCache(unittest.TestCase):
+
+    SETTINGS = {
+        'user': 'test_user',
+        'key1': 'value1',
+    }
+
+    @patch('toggl2github.config.CONFIG_FILE', CONFIG_FILE)
+    def setUp(self) -> None:
+
+        if CONFIG_FILE.exists():
+            CONFIG_FILE.unlink()
+
+        set_config(**self.SETTINGS)
+
+    @patch('keyring.get_password')
+    @patch('toggl2github.config.CONFIG_FILE', CONFIG_FILE)
+    def test_keyring_queried_once(self, mock_get_password: MagicMock):
+        mock_get_password.return_value = 'secret'
+
+        for _ in range(3):
+            config = get_config(['key1', 'password'])
+
+        self.assertEqual(config, {'key1': 'value1', 'password': 'secret'})
+        mock_get_password.assert_called_once_with(service_name='toggl2github.password',
+                                                  username='test_user')
+
+    @patch('keyring.get_password')
+    @patch('toggl2github.config.CONFIG_FILE', CONFIG_FILE)
+    def test_reloads_when_file_changes(self, mock_get_password: MagicMock):
+        get_config(['key1', 'password'])
+
+        CONFIG_FILE.write_text(json.dumps({**self.SETTINGS, 'key1': 'value2'}))
+        stat = CONFIG_FILE.stat()
+        os.utime(CONFIG_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.assertEqual(get_config(['key1', 'password'])['key1'], 'value2')
+        self.assertEqual(mock_get_password.call_count, 2)
+
+    def tearDown(self) -> None:
+
+        if CONFIG_FILE.exists():
+            CONFIG_FILE.unlink()
+
+        clear_cache()
@@ -0,0 +1,166 @@
+import hashlib
+import hmac
+import json
+import time
+import unittest
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest.mock import MagicMock, patch
+
+from toggl2github.cache import EntryStore
+from toggl2github.daemon import Daemon, ProjectState, WebhookServer, is_loopback, run
+from toggl2github.toggl import Project
+
+
+def entry_record(i, description, hours=1, project_id=2) -> dict:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=i)
+    return {'id': i, 'project_id': project_id, 'description': description,
+            'start': start.isoformat(), 'stop': (start + timedelta(hours=hours)).isoformat(),
+            'duration': hours * 3600, 'at': start.isoformat()}
+
+
+def event(action, record) -> dict:
+    return {'event_id': 1, 'metadata': {'action': action, 'model': 'time_entry'},
+            'payload': record}
+
+
+class TestProjectState(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        self.store = EntryStore(1, 2, directory=self.tmp_dir.name)
+        self.store.save(datetime(2024, 2, 1, tzinfo=timezone.utc),
+                        {'0': entry_record(0, '#1 Task'), '1': entry_record(1, '#1 Task')})
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_events_update_durations(self):
+        state = ProjectState(self.project, self.store)
+        self.assertEqual(state.durations, {'#1 Task': 7200})
+
+        self.assertEqual(state.apply('created', entry_record(2, '#2 Task')), {'#2 Task'})
+        self.assertEqual(state.apply('updated', entry_record(1, '#2 Task', hours=2)),
+                         {'#1 Task', '#2 Task'})
+        self.assertEqual(state.apply('deleted', {'id': 0}), {'#1 Task'})
+        self.assertEqual(state.apply('created', entry_record(3, '#3 Task', project_id=9)), set())
+
+        self.assertEqual(state.durations, {'#1 Task': 0, '#2 Task': 3 * 3600})
+
+    def test_running_entries_count_up_to_now(self):
+        state = ProjectState(self.project, self.store)
+        start = datetime.now(timezone.utc) - timedelta(hours=1)
+        state.apply('created', {**entry_record(2, '#1 Task'), 'start': start.isoformat(),
+                                'stop': None, 'duration': -1})
+
+        self.assertAlmostEqual(state.durations['#1 Task'], 3 * 3600, delta=5)
+
+        state.apply('updated', {**entry_record(2, '#1 Task'), 'start': start.isoformat(),
+                                'stop': (start + timedelta(hours=2)).isoformat()})
+        self.assertEqual(state.durations, {'#1 Task': 4 * 3600})
+
+    def test_state_is_persisted(self):
+        state = ProjectState(self.project, self.store)
+        state.apply('created', entry_record(2, '#2 Task'))
+        state.save()
+
+        self.assertEqual(ProjectState(self.project, self.store).durations,
+                         {'#1 Task': 7200, '#2 Task': 3600})
+
+
+class TestDaemon(unittest.TestCase):
+
+    ISSUES = [{'id': 'I1', 'Number': 1, 'Title': 'Task', 'Assignees': ['ghuser'], 'Time Spent': 0},
+              {'id': 'I2', 'Number': 2, 'Title': 'Task', 'Assignees': ['ghuser'], 'Time Spent': 0}]
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.cache_dir = patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name))
+        self.cache_dir.start()
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+
+    def tearDown(self) -> None:
+        self.cache_dir.stop()
+        self.tmp_dir.cleanup()
+
+    @patch('toggl2github.daemon.set_field_values')
+    @patch('toggl2github.daemon.ProjectContext')
+    def test_events_are_coalesced(self,
+                                  mock_project_context: MagicMock,
+                                  mock_set_field_values: MagicMock):
+        mock_project_context.return_value.iter_issues.side_effect = lambda: iter(self.ISSUES)
+        mock_set_field_values.side_effect = lambda *args, **kwargs: [None] * len(args[3])
+        daemon = Daemon([(self.project, 1)], 'ghuser', 'token', debounce=0.1)
+
+        for i in range(3):
+            daemon.handle(event('created', entry_record(i, '#1 Task')))
+        time.sleep(0.5)
+
+        mock_set_field_values.assert_called_once()
+        self.assertEqual(mock_set_field_values.call_args.args[3],
+                         [('I1', 'Time Spent', 'number', 3)])
+
+        # The pushed value is remembered, so pushing the same total again doesn't send anything
+        daemon.handle(event('updated', entry_record(2, '#1 Task')))
+        daemon.flush()
+        mock_set_field_values.assert_called_once()
+        mock_project_context.return_value.iter_issues.assert_called_once()
+
+    @patch('toggl2github.daemon.load_mapping')
+    def test_secret_is_required_on_public_hosts(self, mock_load_mapping: MagicMock):
+        with self.assertRaises(ValueError):
+            run(Path('mapping.json'), host='0.0.0.0')
+        mock_load_mapping.assert_not_called()
+
+        self.assertTrue(is_loopback('127.0.0.1'))
+        self.assertTrue(is_loopback('localhost'))
+        self.assertFalse(is_loopback('example.com'))
+
+    def test_other_events_are_ignored(self):
+        daemon = Daemon([(self.project, 1)], 'ghuser', 'token')
+        daemon.handle({'metadata': {'model': 'project', 'action': 'updated'}, 'payload': {}})
+        self.assertIsNone(daemon._timer)
+
+
+class TestWebhookServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.daemon = MagicMock()
+        self.server = WebhookServer(('127.0.0.1', 0), self.daemon, secret='secret')
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, body: dict, secret='secret'):
+        content = json.dumps(body).encode()
+        signature = 'sha256=' + hmac.new(secret.encode(), content, hashlib.sha256).hexdigest()
+        request = urllib.request.Request(f'http://127.0.0.1:{self.server.server_port}/',
+                                         data=content,
+                                         headers={'X-Webhook-Signature-256': signature})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def test_validation(self):
+        self.assertEqual(self.post({'validation_code': 'abc'}), {'validation_code': 'abc'})
+
+    def test_signed_event_is_handled(self):
+        self.post(event('created', entry_record(0, '#1 Task')))
+        self.daemon.handle.assert_called_once()
+
+    def test_unsigned_event_is_rejected(self):
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self.post(event('created', entry_record(0, '#1 Task')), secret='wrong')
+
+        self.assertEqual(cm.exception.code, 401)
+        self.daemon.handle.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
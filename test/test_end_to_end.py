@@ -0,0 +1,146 @@
+import asyncio
+import json
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from fake_api import GH_PROJECT_NUMBER, GH_REPO, GH_TOKEN, GH_USER, TOGGL_PROJECT_NAME, FakeApi
+from fake_api import FIELDS, GH_PROJECT_ID, Workspace, use_fake_api
+
+from toggl2github.aio import sync_async
+from toggl2github.cache import MetadataStore
+from toggl2github.githubpy import close_completed_milestones, get_issue_details, get_milestones
+from toggl2github.githubpy import index_fields
+from toggl2github.metrics import METRICS
+from toggl2github.toggl import report_end_date
+from toggl2github.toggl2github import apply_plan, sync
+
+
+class TestEndToEnd(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.workspace = Workspace.generate(n_entries=2000, n_issues=150)
+        self.api = FakeApi(self.workspace).__enter__()
+        self.fake_api = use_fake_api(self.api.url, self.tmp_dir.name)
+        self.fake_api.__enter__()
+
+    def tearDown(self) -> None:
+        self.fake_api.__exit__(None, None, None)
+        self.api.__exit__(None, None, None)
+        self.tmp_dir.cleanup()
+
+    def expected_time_spent(self):
+        totals = {}
+        for entry in self.workspace.entries:
+            totals[entry['description']] = totals.get(entry['description'], 0) + entry['seconds']
+        return {f'PVTI_{n}': round(totals[f'#{n} Issue {n}'] / 3600) for n in range(1, 151)}
+
+    def time_spent(self):
+        return {i: issue['values'].get('Time Spent') for i, issue in self.workspace.issues.items()}
+
+    def test_sync(self):
+        METRICS.reset()
+        sync(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER)
+
+        self.assertEqual(self.time_spent(), self.expected_time_spent())
+        routes = self.api.stats['routes']
+        self.assertEqual(routes['github.items'], 2)
+        self.assertEqual(routes['github.mutation'], 3)
+
+        # Every request the fake api saw is accounted for in the metrics
+        self.assertEqual(sum(e.calls for e in METRICS.endpoints.values()),
+                         self.api.stats['requests'])
+        self.assertTrue({'toggl.project', 'toggl.durations', 'group', 'github.issues', 'match',
+                         'github.update'} <= set(METRICS.phases))
+
+    def test_second_sync_only_downloads_changes(self):
+        sync(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER)
+        before = dict(self.api.stats['routes'])
+
+        sync(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER)
+        routes = self.api.stats['routes']
+
+        self.assertEqual(routes['github.mutation'], before['github.mutation'])
+        self.assertEqual(routes['github.project'], before['github.project'])
+        self.assertEqual(routes['github.fields'], before['github.fields'])
+        self.assertLess(routes['toggl.search'] - before['toggl.search'], before['toggl.search'])
+
+    def test_summary_sync(self):
+        sync(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER, summary=True)
+
+        self.assertEqual(self.time_spent(), self.expected_time_spent())
+        self.assertNotIn('toggl.search', self.api.stats['routes'])
+        # One request per year from the first entry to today
+        self.assertEqual(self.api.stats['routes']['toggl.summary'],
+                         report_end_date().year - 2023 + 1)
+
+    def test_sync_async(self):
+        METRICS.reset()
+        asyncio.run(sync_async(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER))
+
+        self.assertEqual(self.time_spent(), self.expected_time_spent())
+        self.assertEqual(sum(e.calls for e in METRICS.endpoints.values()),
+                         self.api.stats['requests'])
+
+        before = dict(self.api.stats['routes'])
+        asyncio.run(sync_async(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER, summary=True))
+        self.assertEqual(self.time_spent(), self.expected_time_spent())
+        self.assertEqual(self.api.stats['routes']['github.mutation'], before['github.mutation'])
+
+    def test_sync_async_refreshes_stored_fields(self):
+        # Metadata stored before the Time Spent field was added to the project
+        MetadataStore(GH_USER, GH_PROJECT_NUMBER).save(
+            GH_PROJECT_ID, [f for f in FIELDS if f.get('name') != 'Time Spent'])
+
+        asyncio.run(sync_async(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER))
+
+        self.assertEqual(self.time_spent(), self.expected_time_spent())
+        self.assertEqual(self.api.stats['routes']['github.fields'], 1)
+        (_, fields) = MetadataStore(GH_USER, GH_PROJECT_NUMBER).load()
+        self.assertIn('time spent', index_fields(fields))
+
+    def test_plan_then_apply(self):
+        plan_file = Path(self.tmp_dir.name) / 'plan.json'
+        sync(TOGGL_PROJECT_NAME, GH_PROJECT_NUMBER, plan_file=plan_file)
+
+        self.assertNotIn('github.mutation', self.api.stats['routes'])
+        self.assertTrue(all(v is None for v in self.time_spent().values()))
+        changes = json.loads(plan_file.read_text())['changes']
+        self.assertEqual({c['item']: c['new'] for c in changes}, self.expected_time_spent())
+        self.assertEqual({c['old'] for c in changes}, {None})
+
+        before = self.api.stats['requests']
+        apply_plan(plan_file)
+
+        self.assertEqual(self.time_spent(), self.expected_time_spent())
+        # Only the mutations are sent
+        self.assertEqual(self.api.stats['requests'] - before,
+                         self.api.stats['routes']['github.mutation'])
+
+    def test_rest_requests_are_revalidated(self):
+        for _ in range(2):
+            self.assertEqual(get_issue_details(GH_USER, GH_TOKEN, GH_REPO, 3)['number'], 3)
+            self.assertEqual(len(get_milestones(GH_USER, GH_TOKEN, GH_REPO)), 10)
+
+        self.assertEqual(self.api.gh_requests, 2)
+        self.assertEqual(self.api.stats['routes']['github.issue'], 2)
+
+    def test_close_completed_milestones_in_every_repo(self):
+        self.api.workspace = Workspace.generate(n_entries=0, n_issues=1, n_milestones=150,
+                                                n_repos=10)
+        self.assertEqual(len(get_milestones(GH_USER, GH_TOKEN, GH_REPO)), 150)
+
+        with self.assertRaises(ValueError):
+            close_completed_milestones()
+
+        close_completed_milestones(all_repos=True, concurrency=8)
+
+        for milestones in self.api.workspace.repos.values():
+            self.assertEqual({m['number'] for m in milestones if m['state'] == 'open'},
+                             set(range(1, 151, 2)))
+        self.assertEqual(self.api.stats['routes']['github.milestone'], 10 * 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,16 @@
+from importlib.util import find_spec
 from math import isnan
 import sys
 import unittest
 from pathlib import Path
-
-import pandas as pd
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
 
 from toggl2github.config import get_config
 from toggl2github.githubpy import create_issue, get_project_field_id, get_project_fields, set_field_value
 from toggl2github.githubpy import get_project_issue_id, get_project_issues
-from toggl2github.githubpy import get_project_node_id, delete_issue
+from toggl2github.githubpy import get_project_node_id, delete_issue, ProjectContext
+from toggl2github.githubpy import set_field_values
 
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -16,11 +18,13 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 TEST_PROJECT_NUMBER = 1
 
 
+@unittest.skipUnless(find_spec('pandas'), 'requires pandas')
 class TestGetProjectIssues(unittest.TestCase):
     (GH_USER, GH_TOKEN) = get_config(['gh_user', 'gh_token']).values()
 
     def test_gets_correct_columns(self):
-        
+        import pandas as pd
+
         df = pd.DataFrame.from_records(get_project_issues(self.GH_USER, 
                                                           self.GH_TOKEN, 
                                                           TEST_PROJECT_NUMBER))
@@ -39,16 +43,208 @@ class TestGetProjectIssues(unittest.TestCase):
         self.assertTrue(all(c in actual_columns for c in expected_columns))
 
 
+class TestProjectContext(unittest.TestCase):
+
+    FIELDS = [{'id': 'F1', 'name': 'Time Spent'}, {'id': 'F2', 'name': 'Status'}, {}]
+    ISSUES = [{'id': 'I1', 'Title': 'First'}, {'id': 'I2', 'Title': 'Second'}]
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.cache_dir = patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name))
+        self.cache_dir.start()
+
+    def tearDown(self) -> None:
+        self.cache_dir.stop()
+        self.tmp_dir.cleanup()
+
+    @patch('toggl2github.githubpy.get_project_issues')
+    @patch('toggl2github.githubpy.get_project_fields')
+    @patch('toggl2github.githubpy.get_project_node_id')
+    def test_resolves_once(self,
+                           mock_get_project_node_id: MagicMock,
+                           mock_get_project_fields: MagicMock,
+                           mock_get_project_issues: MagicMock):
+        mock_get_project_node_id.return_value = 'P1'
+        mock_get_project_fields.return_value = self.FIELDS
+        mock_get_project_issues.return_value = self.ISSUES
+
+        context = ProjectContext('user', 'token', TEST_PROJECT_NUMBER)
+        for _ in range(3):
+            self.assertEqual(context.project_id, 'P1')
+            self.assertEqual(context.field_id('time spent'), 'F1')
+            self.assertEqual(context.item_id('Second'), 'I2')
+
+        self.assertIsNone(context.item_id('Third'))
+        mock_get_project_node_id.assert_called_once()
+        mock_get_project_fields.assert_called_once_with('user', 'token', TEST_PROJECT_NUMBER,
+                                                        project_id='P1')
+        mock_get_project_issues.assert_called_once_with('user', 'token', TEST_PROJECT_NUMBER,
+                                                        project_id='P1')
+
+    @patch('toggl2github.githubpy.get_project_fields')
+    @patch('toggl2github.githubpy.get_project_node_id')
+    def test_metadata_is_stored(self,
+                                mock_get_project_node_id: MagicMock,
+                                mock_get_project_fields: MagicMock):
+        mock_get_project_node_id.return_value = 'P1'
+        mock_get_project_fields.return_value = self.FIELDS
+
+        ProjectContext('user', 'token', TEST_PROJECT_NUMBER).field_id('Status')
+        context = ProjectContext('user', 'token', TEST_PROJECT_NUMBER)
+        self.assertEqual((context.project_id, context.field_id('Status')), ('P1', 'F2'))
+        self.assertEqual(mock_get_project_fields.call_count, 1)
+
+        ProjectContext('user', 'token', TEST_PROJECT_NUMBER, refresh_metadata=True).field_ids
+        self.assertEqual(mock_get_project_fields.call_count, 2)
+
+        ProjectContext('user', 'token', TEST_PROJECT_NUMBER, metadata_ttl=-1).field_ids
+        self.assertEqual(mock_get_project_fields.call_count, 3)
+
+    @patch('toggl2github.githubpy.get_project_fields')
+    @patch('toggl2github.githubpy.get_project_node_id')
+    def test_unknown_field_refreshes_metadata(self,
+                                              mock_get_project_node_id: MagicMock,
+                                              mock_get_project_fields: MagicMock):
+        mock_get_project_node_id.return_value = 'P1'
+        mock_get_project_fields.return_value = self.FIELDS
+        ProjectContext('user', 'token', TEST_PROJECT_NUMBER).field_ids
+
+        mock_get_project_fields.return_value = self.FIELDS + [{'id': 'F3', 'name': 'Phase'}]
+        context = ProjectContext('user', 'token', TEST_PROJECT_NUMBER)
+
+        self.assertEqual(context.field_id('Phase'), 'F3')
+        self.assertEqual(mock_get_project_fields.call_count, 2)
+
+    @patch('toggl2github.githubpy.get_session')
+    @patch('toggl2github.githubpy.get_project_fields')
+    @patch('toggl2github.githubpy.get_project_node_id')
+    def test_unknown_item_invalidates_metadata(self,
+                                               mock_get_project_node_id: MagicMock,
+                                               mock_get_project_fields: MagicMock,
+                                               mock_get_session: MagicMock):
+        mock_get_project_node_id.return_value = 'P1'
+        mock_get_project_fields.return_value = self.FIELDS
+        mock_post = mock_get_session.return_value.post
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'data': {'u0': None},
+            'errors': [{'path': ['u0'], 'message': "Could not resolve to a node with the global "
+                                                   "id of 'I9'"}]
+        }
+        context = ProjectContext('user', 'token', TEST_PROJECT_NUMBER)
+
+        set_field_values('user', 'token', TEST_PROJECT_NUMBER,
+                         [('I9', 'Time Spent', 'number', 1)], context=context)
+
+        self.assertIsNone(context.store.load())
+
+    @patch('toggl2github.githubpy.get_session')
+    @patch('toggl2github.githubpy.get_project_fields')
+    @patch('toggl2github.githubpy.get_project_node_id')
+    def test_missing_field_keeps_metadata(self,
+                                          mock_get_project_node_id: MagicMock,
+                                          mock_get_project_fields: MagicMock,
+                                          mock_get_session: MagicMock):
+        mock_get_project_node_id.return_value = 'P1'
+        mock_get_project_fields.return_value = self.FIELDS
+        context = ProjectContext('user', 'token', TEST_PROJECT_NUMBER)
+
+        errors = set_field_values('user', 'token', TEST_PROJECT_NUMBER,
+                                  [('I1', 'Phase', 'text', 'Done')], context=context)
+
+        self.assertIn('not found', errors[0])
+        self.assertEqual(context.store.load(), ('P1', self.FIELDS))
+        mock_get_session.return_value.post.assert_not_called()
+
+
+class TestIssuePagination(unittest.TestCase):
+
+    @staticmethod
+    def page(ids, end_cursor, has_next_page):
+        return {'data': {'node': {'items': {
+            'pageInfo': {'hasNextPage': has_next_page, 'endCursor': end_cursor},
+            'nodes': [{'id': i,
+                       'fieldValues': {'pageInfo': {'hasNextPage': False, 'endCursor': None},
+                                       'nodes': [{'text': f'Title {i}', 'field': {'name': 'Title'}},
+                                                 {}]},
+                       'content': {'url': f'https://github.com/u/r/issues/{n}',
+                                   'assignees': {'nodes': [{'login': 'user'}]}}}
+                      for n, i in enumerate(ids)]
+        }}}}
+
+    @patch('toggl2github.githubpy.get_session')
+    def test_follows_cursor(self, mock_get_session: MagicMock):
+        mock_post = mock_get_session.return_value.post
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.side_effect = [self.page(['I0', 'I1'], 'C1', True),
+                                                   self.page(['I2'], 'C2', False)]
+
+        issues = get_project_issues('user', 'token', TEST_PROJECT_NUMBER, project_id='P1',
+                                    page_size=2)
+
+        self.assertEqual(next(issues)['id'], 'I0')
+        self.assertEqual(mock_post.call_count, 1)
+        issues = list(issues)
+        self.assertEqual([i['id'] for i in issues], ['I1', 'I2'])
+        self.assertEqual(issues[1], {'id': 'I2', 'Title': 'Title I2', 'Assignees': ['user'],
+                                     'url': 'https://github.com/u/r/issues/0', 'Number': 0})
+        self.assertIn('after: "C1"', mock_post.call_args_list[1].kwargs['json']['query'])
+
+
+class TestSetFieldValues(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.context = MagicMock(project_id='P1')
+        self.context.field_id.side_effect = lambda name: {'time spent': 'F1'}.get(name.lower())
+
+    @patch('toggl2github.githubpy.get_session')
+    def test_sends_updates_in_chunks(self, mock_get_session: MagicMock):
+        mock_post = mock_get_session.return_value.post
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {'data': {}}
+        updates = [(f'I{i}', 'Time Spent', 'number', i) for i in range(7)]
+
+        errors = set_field_values('user', 'token', TEST_PROJECT_NUMBER, updates,
+                                  chunk_size=3, context=self.context)
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(errors, [None] * 7)
+        query = mock_post.call_args_list[0].kwargs['json']['query']
+        self.assertEqual(query.count('updateProjectV2ItemFieldValue'), 3)
+        self.assertIn('itemId: "I2"', query)
+
+    @patch('toggl2github.githubpy.get_session')
+    def test_reports_per_item_errors(self, mock_get_session: MagicMock):
+        mock_post = mock_get_session.return_value.post
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'data': {'u0': {'projectV2Item': {'id': 'I0'}}, 'u1': None},
+            'errors': [{'path': ['u1'], 'message': 'Could not resolve to a node'}]
+        }
+        updates = [('I0', 'Time Spent', 'number', 1),
+                   ('I1', 'Time Spent', 'number', 2),
+                   ('I2', 'Unknown', 'number', 3)]
+
+        errors = set_field_values('user', 'token', TEST_PROJECT_NUMBER, updates,
+                                  context=self.context)
+
+        self.assertIsNone(errors[0])
+        self.assertEqual(errors[1], 'Could not resolve to a node')
+        self.assertIn('Unknown', errors[2])
+
+
 class TestCreateIssue(unittest.TestCase):
     ...
 
 
+@unittest.skipUnless(find_spec('pandas'), 'requires pandas')
 class TestSetFieldValue(unittest.TestCase):
     TEST_ISSUE_NAME = 'Phase 3B Project Work Plan'
     TEST_VALUE = 999
     (GH_USER, GH_TOKEN) = get_config(['gh_user', 'gh_token']).values()
 
     def setUp(self) -> None:
+        import pandas as pd
 
         df = pd.DataFrame.from_records(get_project_issues(self.GH_USER, 
                                                           self.GH_TOKEN, TEST_PROJECT_NUMBER))
@@ -62,6 +258,8 @@ class TestSetFieldValue(unittest.TestCase):
                         self.TEST_VALUE)
 
     def test_field_value_set(self):
+        import pandas as pd
+
         df = pd.DataFrame.from_records(get_project_issues(self.GH_USER, 
                                                           self.GH_TOKEN, TEST_PROJECT_NUMBER))
         actual_value = df[df['Title'] == self.TEST_ISSUE_NAME]['Time Spent'].values[0]
@@ -0,0 +1,62 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from toggl2github.metrics import METRICS, Metrics, endpoint
+from toggl2github.session import Session
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self) -> None:
+        METRICS.reset()
+
+    def test_endpoint_labels(self):
+        self.assertEqual(endpoint('get', 'https://api.github.com/repos/u/r/issues/12'),
+                         'GET api.github.com/repos/u/r/issues/{id}')
+        self.assertEqual(endpoint('POST', 'https://api.github.com/graphql',
+                                  {'query': 'mutation { u0: updateProjectV2ItemFieldValue(...) }'}),
+                         'POST api.github.com/graphql updateProjectV2ItemFieldValue')
+        self.assertEqual(endpoint('POST', 'https://api.track.toggl.com/reports/api/v3/workspace/1/'
+                                          'search/time_entries', {'page_size': 1000}),
+                         'POST api.track.toggl.com/reports/api/v3/workspace/{id}/search/time_entries')
+
+    @patch('toggl2github.session.time.sleep')
+    @patch('requests.Session.request')
+    def test_session_requests_are_recorded(self, mock_request: MagicMock, mock_sleep: MagicMock):
+        mock_request.side_effect = [MagicMock(status_code=503, headers={}, content=b''),
+                                    MagicMock(status_code=200, headers={}, content=b'{"a": 1}')]
+
+        Session().post('https://api.github.com/graphql', json={'query': 'query { items }'})
+
+        stats = METRICS.endpoints['POST api.github.com/graphql items']
+        self.assertEqual((stats.calls, stats.retries, stats.errors), (1, 1, 0))
+        self.assertEqual(stats.bytes_sent, len(json.dumps({'query': 'query { items }'})))
+        self.assertEqual(stats.bytes_received, 8)
+        self.assertEqual(stats.latency.count, 1)
+
+    def test_exports(self):
+        metrics = Metrics()
+        metrics.record_request('GET api.github.com/user', 0.02, 200, bytes_received=100)
+        metrics.record_request('GET api.github.com/user', 2, 500, retries=3)
+        with metrics.phase('match'):
+            pass
+
+        prometheus = metrics.to_prometheus()
+        self.assertIn('toggl2github_requests_total{endpoint="GET api.github.com/user"} 2',
+                      prometheus)
+        self.assertIn('toggl2github_request_errors_total{endpoint="GET api.github.com/user"} 1',
+                      prometheus)
+        self.assertIn('toggl2github_request_duration_seconds_bucket'
+                      '{endpoint="GET api.github.com/user",le="0.025"} 1', prometheus)
+        self.assertIn('toggl2github_request_duration_seconds_bucket'
+                      '{endpoint="GET api.github.com/user",le="+Inf"} 2', prometheus)
+        self.assertIn('toggl2github_phase_duration_seconds_count{phase="match"} 1', prometheus)
+
+        exported = json.loads(metrics.to_json())
+        self.assertEqual(exported['endpoints']['GET api.github.com/user']['retries'], 3)
+        self.assertIn('match', metrics.format_table())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import time
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from toggl2github.cache import HttpCache
+from toggl2github.githubpy import get_session
+from toggl2github.session import RateLimiter, Session, retry_delay
+
+
+class TestSession(unittest.TestCase):
+
+    def test_pool_size(self):
+        session = Session(pool_size=4)
+        adapter = session.get_adapter('https://api.github.com')
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    @patch('requests.Session.request')
+    def test_default_timeout_and_headers(self, mock_request: MagicMock):
+        mock_request.return_value = mock_response(200)
+        session = Session(headers={'Authorization': 'Bearer token'}, timeout=5)
+        session.get('https://api.github.com/user')
+        session.get('https://api.github.com/user', timeout=1)
+
+        self.assertEqual(mock_request.call_args_list[0].kwargs['timeout'], 5)
+        self.assertEqual(mock_request.call_args_list[1].kwargs['timeout'], 1)
+        self.assertEqual(session.headers['Authorization'], 'Bearer token')
+
+    def test_github_session_is_shared(self):
+        self.assertIs(get_session('token'), get_session('token'))
+        self.assertIsNot(get_session('token'), get_session('other token'))
+
+
+def mock_response(status_code, headers=None):
+    return MagicMock(status_code=status_code, headers=headers or {})
+
+
+class TestRetries(unittest.TestCase):
+
+    @patch('toggl2github.session.time.sleep')
+    @patch('requests.Session.request')
+    def test_retries_transient_failures(self, mock_request: MagicMock, mock_sleep: MagicMock):
+        mock_request.side_effect = [mock_response(502), mock_response(503), mock_response(200)]
+        session = Session()
+
+        response = session.get('https://api.track.toggl.com/api/v9/me')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual((session.stats.requests, session.stats.retries), (3, 2))
+
+    @patch('toggl2github.session.time.sleep')
+    @patch('requests.Session.request')
+    def test_honours_retry_after(self, mock_request: MagicMock, mock_sleep: MagicMock):
+        mock_request.side_effect = [mock_response(429, {'Retry-After': '7'}), mock_response(200)]
+        session = Session()
+
+        session.get('https://api.track.toggl.com/api/v9/me')
+
+        self.assertGreaterEqual(sum(c.args[0] for c in mock_sleep.call_args_list), 7)
+        self.assertGreaterEqual(session.stats.throttled_seconds, 7)
+
+    @patch('toggl2github.session.time.sleep')
+    @patch('requests.Session.request')
+    def test_gives_up_after_max_retries(self, mock_request: MagicMock, mock_sleep: MagicMock):
+        mock_request.return_value = mock_response(500)
+        session = Session(max_retries=2)
+
+        self.assertEqual(session.get('https://api.github.com/user').status_code, 500)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @patch('requests.Session.request')
+    def test_client_errors_are_not_retried(self, mock_request: MagicMock):
+        mock_request.return_value = mock_response(404)
+        Session().get('https://api.github.com/user')
+        mock_request.assert_called_once()
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_waits_for_reset_when_exhausted(self):
+        limiter = RateLimiter()
+        limiter.update({'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(int(time.time()) + 60)})
+        self.assertEqual(limiter.delay(), 0)
+
+        limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + 60)})
+        self.assertGreater(limiter.delay(), 50)
+
+    def test_secondary_rate_limit_is_retried(self):
+        self.assertEqual(retry_delay(403, {'Retry-After': '30'}, 0), 30)
+        self.assertIsNone(retry_delay(403, {}, 0))
+        self.assertLessEqual(retry_delay(503, {}, 3), 8)
+
+
+def http_response(status_code, content=b'', headers=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.cache = HttpCache(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    @patch('requests.Session.request')
+    def test_revalidates_with_etag(self, mock_request: MagicMock):
+        mock_request.side_effect = [http_response(200, b'{"number": 1}', {'ETag': '"abc"'}),
+                                    http_response(304)]
+        session = Session(headers={'Authorization': 'Bearer token'}, http_cache=self.cache)
+        url = 'https://api.github.com/repos/user/repo/milestones'
+
+        first = session.get(url, params={'state': 'all'})
+        second = session.get(url, params={'state': 'all'})
+
+        self.assertNotIn('headers', mock_request.call_args_list[0].kwargs)
+        self.assertEqual(mock_request.call_args_list[1].kwargs['headers'],
+                         {'If-None-Match': '"abc"'})
+        self.assertEqual((second.status_code, second.json()), (200, first.json()))
+        self.assertEqual(session.stats.not_modified, 1)
+
+    @patch('requests.Session.request')
+    def test_credentials_are_not_shared(self, mock_request: MagicMock):
+        mock_request.return_value = http_response(200, b'{}', {'ETag': '"abc"'})
+        url = 'https://api.github.com/user'
+
+        Session(headers={'Authorization': 'Bearer a'}, http_cache=self.cache).get(url)
+        Session(headers={'Authorization': 'Bearer b'}, http_cache=self.cache).get(url)
+
+        self.assertNotIn('headers', mock_request.call_args_list[1].kwargs)
+
+    def test_evicts_least_recently_used(self):
+        for i, key in enumerate(['a', 'b', 'c']):
+            self.cache.put(key, f'"{key}"', 'x' * 100)
+            os.utime(self.cache.directory / f'{key}.json', (time.time() - 30 + i, ) * 2)
+        self.cache.get('a')
+
+        self.cache.max_bytes = 300
+        self.cache.evict()
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_directory_is_only_scanned_to_evict(self):
+        self.cache.max_bytes = 1000
+        with patch.object(self.cache, 'evict', wraps=self.cache.evict) as mock_evict:
+            for i in range(10):
+                self.cache.put(str(i), f'"{i}"', 'x' * 10)
+            self.cache.put('0', '"0"', 'x' * 10)
+            self.assertEqual(mock_evict.call_count, 1)
+
+            self.cache.put('big', '"big"', 'x' * 1000)
+            self.assertEqual(mock_evict.call_count, 2)
+
+        self.assertLessEqual(sum(p.stat().st_size for p in self.cache.directory.glob('*.json')),
+                             1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).parent.parent
+
+# Wall time allowed for commands that don't talk to Toggl or Github, including interpreter startup
+STARTUP_BUDGET = 1.5
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.env = {**os.environ, 'HOME': self.tmp_dir.name, 'USERPROFILE': self.tmp_dir.name,
+                    'PYTHONPATH': str(ROOT)}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def run_python(self, *args) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=self.env, check=True, capture_output=True)
+        return time.perf_counter() - start
+
+    def test_heavy_modules_are_not_imported(self):
+        script = ('import sys, toggl2github.__main__; '
+                  'assert not {"pandas", "numpy", "keyring", "aiohttp"} & set(sys.modules)')
+        self.run_python('-c', script)
+
+    def test_help_is_fast(self):
+        self.assertLess(self.run_python('-m', 'toggl2github', '--help'), STARTUP_BUDGET)
+
+    def test_config_is_fast(self):
+        self.assertLess(self.run_python('-m', 'toggl2github', 'config', '--gh_user', 'user'),
+                        STARTUP_BUDGET)
+        self.assertTrue((Path(self.tmp_dir.name) / '.toggl2github').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,20 @@
 import datetime
+import io
+import json
 import random
 import string
+import time
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from typing import List, Tuple
+from contextlib import redirect_stderr
 from unittest.mock import MagicMock, patch
 
+from toggl2github.__main__ import main
 from toggl2github.config import get_config
-from toggl2github.toggl2github import sync
+from toggl2github.toggl2github import index_issues, index_matching_issues, load_mapping, match_tasks
+from toggl2github.toggl2github import sync, sync_all
 
 
 class TestToggl2Github(unittest.TestCase):
@@ -17,11 +25,11 @@ class TestToggl2Github(unittest.TestCase):
                                                           'gh_token']).values()
 
     @patch('toggl2github.toggl2github.get_project')
-    @patch('toggl2github.toggl2github.get_project_issues')
-    @patch('toggl2github.toggl2github.set_field_value')
+    @patch('toggl2github.toggl2github.ProjectContext')
+    @patch('toggl2github.toggl2github.set_field_values')
     def test_sync(self,
-                  mock_set_field_value: MagicMock,
-                  mock_get_project_issues: MagicMock,
+                  mock_set_field_values: MagicMock,
+                  mock_project_context: MagicMock,
                   mock_get_project: MagicMock) -> None:
         toggle_project_name: str = 'Test Toggl Project'
         github_project_name: str = 'Test Github Project'
@@ -30,18 +38,193 @@ class TestToggl2Github(unittest.TestCase):
         # Mocking the return values
         mock_issues, mock_tasks = mock_issues_and_tasks(self.GH_USER, github_project_name, 1)
         mock_get_project.return_value = MockTogglProject(mock_tasks)
-        mock_get_project_issues.return_value = mock_issues
+        mock_project_context.return_value.iter_issues.return_value = iter(mock_issues)
 
         sync(toggle_project_name, github_project_number)
 
-        # Asserting that the set_field_value function is called with the correct arguments
-        mock_set_field_value.assert_called_with(self.GH_USER,
-                                                self.GH_TOKEN,
-                                                github_project_number,
-                                                mock_issues[0]['Title'],
-                                                'Time Spent',
-                                                'number',
-                                                round(mock_tasks[0].duration/3600))
+        # Asserting that the set_field_values function is called with the correct arguments
+        mock_set_field_values.assert_called_with(self.GH_USER,
+                                                 self.GH_TOKEN,
+                                                 github_project_number,
+                                                 [(mock_issues[0]['id'],
+                                                   'Time Spent',
+                                                   'number',
+                                                   round(mock_tasks[0].duration/3600))],
+                                                 context=mock_project_context.return_value)
+
+    @patch('toggl2github.toggl2github.get_project')
+    @patch('toggl2github.toggl2github.ProjectContext')
+    @patch('toggl2github.toggl2github.set_field_values')
+    def test_sync_resolves_project_once(self,
+                                        mock_set_field_values: MagicMock,
+                                        mock_project_context: MagicMock,
+                                        mock_get_project: MagicMock) -> None:
+        github_project_number: int = 123
+
+        mock_issues, mock_tasks = mock_issues_and_tasks(self.GH_USER, 'Test Github Project', 20)
+        mock_get_project.return_value = MockTogglProject(mock_tasks)
+        mock_project_context.return_value.iter_issues.return_value = iter(mock_issues)
+
+        sync('Test Toggl Project', github_project_number)
+
+        mock_project_context.assert_called_once_with(self.GH_USER,
+                                                     self.GH_TOKEN,
+                                                     github_project_number,
+                                                     refresh_metadata=False)
+        mock_set_field_values.assert_called_once()
+        self.assertEqual(len(mock_set_field_values.call_args.args[3]), len(mock_tasks))
+
+    @patch('toggl2github.toggl2github.get_project')
+    @patch('toggl2github.toggl2github.ProjectContext')
+    @patch('toggl2github.toggl2github.set_field_values')
+    def test_sync_skips_unchanged(self,
+                                  mock_set_field_values: MagicMock,
+                                  mock_project_context: MagicMock,
+                                  mock_get_project: MagicMock) -> None:
+        mock_issues, mock_tasks = mock_issues_and_tasks(self.GH_USER, 'Test Github Project', 10)
+        for task in mock_tasks[:9]:
+            task.duration *= 3600
+        mock_get_project.return_value = MockTogglProject(mock_tasks)
+        mock_project_context.return_value.iter_issues.return_value = iter(mock_issues)
+        mock_set_field_values.return_value = [None]
+
+        with self.assertLogs('toggl2github.toggl2github', level='INFO') as lc:
+            sync('Test Toggl Project', 123)
+
+        self.assertEqual(mock_set_field_values.call_args.args[3],
+                         [(mock_issues[9]['id'], 'Time Spent', 'number', 0)])
+        self.assertIn('skipped 9 unchanged', lc.output[-1])
+
+
+class TestSyncAll(unittest.TestCase):
+
+    (GH_USER, GH_TOKEN) = get_config(['gh_user', 'gh_token']).values()
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.mapping_file = Path(self.tmp_dir.name) / 'mapping.json'
+        self.mapping_file.write_text(json.dumps({'NNL': 1, 'website': [2, 3], 'Missing': 4}))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_load_mapping(self):
+        self.assertEqual(load_mapping(self.mapping_file),
+                         {'NNL': [1], 'website': [2, 3], 'Missing': [4]})
+
+    @patch('toggl2github.toggl2github.update_time_spent')
+    @patch('toggl2github.toggl2github.fetch_project_entries')
+    @patch('toggl2github.toggl2github.get_all_projects')
+    def test_sync_all(self,
+                      mock_get_all_projects: MagicMock,
+                      mock_fetch_project_entries: MagicMock,
+                      mock_update_time_spent: MagicMock):
+        nnl = MagicMock(id=1)
+        nnl.name = 'NNL'
+        website = MagicMock(id=2)
+        website.name = 'Website'
+        mock_get_all_projects.return_value = [nnl, website]
+        mock_update_time_spent.side_effect = [None, Exception('Boom'), None]
+
+        with self.assertLogs('toggl2github.toggl2github', level='WARNING') as lc:
+            sync_all(self.mapping_file, concurrency=1)
+
+        mock_get_all_projects.assert_called_once()
+        mock_fetch_project_entries.assert_called_once_with([nnl, website])
+        self.assertEqual(sorted(c.args[3] for c in mock_update_time_spent.call_args_list), [1, 2, 3])
+        self.assertTrue(any('Missing not found' in o for o in lc.output))
+        self.assertTrue(any('Boom' in o for o in lc.output))
+
+    @patch('toggl2github.toggl2github.update_time_spent')
+    @patch('toggl2github.toggl2github.fetch_project_entries')
+    @patch('toggl2github.toggl2github.get_summary_durations')
+    @patch('toggl2github.toggl2github.get_all_projects')
+    def test_sync_all_summary(self,
+                              mock_get_all_projects: MagicMock,
+                              mock_get_summary_durations: MagicMock,
+                              mock_fetch_project_entries: MagicMock,
+                              mock_update_time_spent: MagicMock):
+        nnl = MagicMock(id=1)
+        nnl.name = 'NNL'
+        website = MagicMock(id=2)
+        website.name = 'Website'
+        mock_get_all_projects.return_value = [nnl, website]
+        mock_get_summary_durations.return_value = {1: {'#1 Task': 3600}}
+
+        with self.assertLogs('toggl2github.toggl2github', level='WARNING'):
+            sync_all(self.mapping_file, concurrency=1, since=datetime.date(2024, 1, 1),
+                     summary=True)
+
+        mock_get_summary_durations.assert_called_once()
+        self.assertEqual(mock_get_summary_durations.call_args.args[2:],
+                         ([1, 2], datetime.date(2024, 1, 1), None))
+        mock_fetch_project_entries.assert_not_called()
+        self.assertEqual(sorted((c.args[3], c.args[0]) for c in mock_update_time_spent.call_args_list),
+                         [(1, {'#1 Task': 3600}), (2, {}), (3, {})])
+
+
+class TestMatchTasks(unittest.TestCase):
+
+    def test_match_is_case_insensitive(self):
+        issues = index_issues([{'id': 'I1', 'Number': 1, 'Title': 'Fix The Bug'},
+                               {'id': 'I2', 'Number': 2, 'Title': 'Fix The Bug'},
+                               {'id': 'I3', 'Number': None, 'Title': 'Draft'}])
+        durations = {'#2 fix the bug': 60, '#3 Fix The Bug': 60, 'Other': 1}
+
+        matches = list(match_tasks(durations, issues))
+
+        self.assertEqual([(desc, issue and issue['id']) for desc, _, issue in matches],
+                         [('fix the bug', 'I2'), ('Fix The Bug', None)])
+
+    def test_only_matching_issues_are_kept(self):
+        def issues():
+            for n in range(10000):
+                yield {'id': f'I{n}', 'Number': n, 'Title': f'Issue {n}'}
+
+        index = index_matching_issues(issues(), {'#3 issue 3': 60, '#4 Other': 60, 'Misc': 60})
+
+        self.assertEqual(list(index), [(3, 'issue 3')])
+
+    def test_scales_linearly(self):
+        def time_match(n):
+            mock_issues = [{'id': str(i), 'Number': i, 'Title': f'Issue {i}'} for i in range(n)]
+            durations = {f'#{i} issue {i}': i for i in range(n)}
+
+            start = time.perf_counter()
+            matches = list(match_tasks(durations, index_issues(mock_issues)))
+            elapsed = time.perf_counter() - start
+
+            self.assertTrue(all(issue is not None for _, _, issue in matches))
+            return elapsed
+
+        (t_1k, t_10k) = (min(time_match(n) for _ in range(3)) for n in (1000, 10000))
+
+        # 10x the tasks and issues should take ~10x as long (100x if it were quadratic)
+        self.assertLess(t_10k, 30 * t_1k)
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def parse_error(self, *argv) -> str:
+        stderr = io.StringIO()
+        with patch('sys.argv', ['toggl2github', *argv]), redirect_stderr(stderr), \
+                self.assertRaises(SystemExit) as cm:
+            main()
+
+        self.assertEqual(cm.exception.code, 2)
+        return stderr.getvalue()
+
+    def test_apply_rejects_projects(self):
+        self.assertIn('--apply takes the projects from the plan',
+                      self.parse_error('sync', '--apply', 'plan.json', 'NNL'))
+        self.assertIn('--apply takes the projects from the plan',
+                      self.parse_error('sync', '--apply', 'plan.json', 'NNL', '1'))
+
+    def test_since_must_not_be_after_until(self):
+        for command in [['sync', 'NNL', '1'], ['sync-all', 'mapping.json']]:
+            self.assertIn('--since must not be after --until',
+                          self.parse_error(*command, '--since', '2024-02-01',
+                                           '--until', '2024-01-31'))
 
 
 class MockTask:
@@ -54,6 +237,9 @@ class MockTogglProject:
     def __init__(self, mock_tasks: List[MockTask] = None):
         self.tasks: List[MockTask] = [] if mock_tasks is None else mock_tasks
 
+    def durations(self, since=None, until=None, summary=False, use_cache=True):
+        return {task.description: task.duration for task in self.tasks}
+
 
 class MockGithubIssue:
     def __init__(self, number, title):
@@ -1,7 +1,19 @@
+import time
+from base64 import b64encode
+from importlib.util import find_spec
+import tracemalloc
 import unittest
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
 
+from toggl2github.cache import EntryStore
 from toggl2github.config import get_config
-from toggl2github.toggl import Project, get_all_projects, get_project
+from toggl2github.toggl import API_ENDPOINT, Entry, Project, Task, fetch_project_entries
+from toggl2github.toggl import get_all_projects
+from toggl2github.toggl import aggregate_entries, get_project
+from toggl2github.toggl import get_records, get_summary_durations, get_session, report_end_date
 
 TEST_PROJECT_NAME = 'NNL'
 
@@ -42,3 +54,371 @@ class TestTogglpy(unittest.TestCase):
             task = tasks.get(entry.description, None)
             self.assertTrue(task is not None)
             self.assertTrue(entry in task.entries)
+
+
+class MockReportsSession:
+    """Serves `records` from a fake reports api, filtered by the requested date window."""
+
+    def __init__(self, records, created_at='2023-06-01T00:00:00+00:00', latency=0):
+        self.records = records
+        self.created_at = created_at
+        self.latency = latency
+        self.windows = []
+
+    def get(self, url):
+        return MagicMock(status_code=200, json=MagicMock(return_value={'created_at': self.created_at}))
+
+    def post(self, url, json):
+        time.sleep(self.latency)
+        (start, end) = (date.fromisoformat(json['start_date']), date.fromisoformat(json['end_date']))
+        if json['first_row_number'] == 1:
+            self.windows.append((start, end))
+
+        page = [{'description': r['description'],
+                 'time_entries': [{k: v for k, v in r.items() if k != 'description'}]}
+                for r in self.records
+                if start <= date.fromisoformat(r['start'][:10]) <= end]
+        page = page[json['first_row_number']-1:json['first_row_number']-1+json['page_size']]
+        return MagicMock(status_code=200, json=MagicMock(return_value=page))
+
+
+def mock_record(id, start: datetime, hours=1, description='#1 Task'):
+    return {'id': id,
+            'description': description,
+            'start': start.isoformat(),
+            'stop': (start + timedelta(hours=hours)).isoformat()}
+
+
+class TestTogglAuth(unittest.TestCase):
+
+    @patch('requests.Session.send')
+    @patch('toggl2github.toggl.get_config')
+    def test_password_change_is_picked_up(self, mock_get_config: MagicMock, mock_send: MagicMock):
+        mock_send.return_value = MagicMock(status_code=200, headers={})
+        get_session.cache_clear()
+        session = get_session('auth_user')
+
+        for password in ['old', 'new']:
+            mock_get_config.return_value = {'toggl_password': password}
+            session.get(f'{API_ENDPOINT}/me')
+
+        self.assertEqual([c.args[0].headers['Authorization'] for c in mock_send.call_args_list],
+                         ['Basic ' + b64encode(f'auth_user:{p}'.encode()).decode()
+                          for p in ['old', 'new']])
+        get_session.cache_clear()
+
+
+class TestEntryCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.records = [mock_record(1, datetime(2023, 7, 1, tzinfo=timezone.utc)),
+                        mock_record(2, now - timedelta(days=400)),
+                        mock_record(3, now - timedelta(days=1)),
+                        mock_record(5, now - timedelta(days=2))]
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    @patch('toggl2github.toggl.get_session')
+    def test_second_fetch_is_incremental(self, mock_get_session: MagicMock):
+        with patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name)):
+            session = mock_get_session.return_value = MockReportsSession(self.records)
+            first = self.project.fetch_entries(lookback_days=7)
+            self.assertEqual(session.windows[0][0], date(2023, 6, 1))
+
+            # An entry is edited and another deleted since the last fetch
+            session.windows = []
+            self.records[2]['description'] = '#1 Renamed'
+            self.records.pop(3)
+            self.records.append(mock_record(4, datetime.now(timezone.utc) - timedelta(hours=2)))
+            second = self.project.fetch_entries(lookback_days=7)
+
+        self.assertEqual(len(session.windows), 1)
+        self.assertEqual(session.windows[0][0],
+                         (datetime.now(timezone.utc) - timedelta(days=7)).date())
+        # Today in timezones ahead of UTC is included
+        self.assertEqual(session.windows[0][1],
+                         datetime.now(timezone.utc).date() + timedelta(days=1))
+        self.assertEqual(sorted(e.id for e in first), [1, 2, 3, 5])
+        self.assertEqual(sorted(e.id for e in second), [1, 2, 3, 4])
+        self.assertEqual(next(e for e in second if e.id == 3).description, '#1 Renamed')
+
+    @patch('toggl2github.toggl.get_session')
+    def test_fetch_without_cache(self, mock_get_session: MagicMock):
+        with patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name)):
+            mock_get_session.return_value = MockReportsSession(self.records)
+            entries = self.project.fetch_entries(use_cache=False)
+
+            self.assertEqual(len(entries), 4)
+            self.assertFalse(EntryStore(1, 2).path.exists())
+
+    @patch('toggl2github.toggl.get_session')
+    def test_durations_without_cache_are_streamed(self, mock_get_session: MagicMock):
+        since = (datetime.now(timezone.utc) - timedelta(days=10)).date()
+        with patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name)):
+            session = mock_get_session.return_value = MockReportsSession(self.records)
+            durations = self.project.durations(since=since, use_cache=False)
+
+            self.assertFalse(EntryStore(1, 2).path.exists())
+
+        self.assertEqual(durations, {'#1 Task': 2 * 3600})
+        self.assertEqual(session.windows[0][0], since)
+        self.assertIsNone(self.project._entries)
+
+    @patch('toggl2github.toggl.get_session')
+    def test_projects_share_one_fetch(self, mock_get_session: MagicMock):
+        other = Project('user', id=3, workspace_id=1, name='Other')
+        for i, record in enumerate(self.records):
+            record['project_id'] = 3 if i % 2 == 0 else 2
+
+        with patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name)):
+            session = mock_get_session.return_value = MockReportsSession(self.records)
+            fetch_project_entries([self.project, other])
+
+        self.assertEqual(len(session.windows), report_end_date().year - 2023 + 1)
+        self.assertEqual(sorted(e.id for e in self.project.entries), [2, 5])
+        self.assertEqual(sorted(e.id for e in other.entries), [1, 3])
+
+    @patch('toggl2github.toggl.get_session')
+    def test_records_without_project_need_a_single_project(self, mock_get_session: MagicMock):
+        other = Project('user', id=3, workspace_id=1, name='Other')
+        self.records[0]['project_id'] = 3
+
+        with patch('toggl2github.config.CACHE_DIR', Path(self.tmp_dir.name)):
+            mock_get_session.return_value = MockReportsSession(self.records)
+            fetch_project_entries([self.project, other])
+            self.assertEqual([e.id for e in self.project.entries], [])
+            self.assertEqual([e.id for e in other.entries], [1])
+
+            self.project.fetch_entries(use_cache=False)
+            self.assertEqual(sorted(e.id for e in self.project.entries), [2, 3, 5])
+
+
+class TestConcurrentFetch(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        self.records = [mock_record(i, datetime(year, 3, 1 + i % 10, tzinfo=timezone.utc))
+                        for year in range(2019, 2025) for i in range(year*10, year*10+5)]
+
+    @patch('toggl2github.toggl.get_session')
+    def test_order_is_deterministic(self, mock_get_session: MagicMock):
+        mock_get_session.return_value = MockReportsSession(self.records, latency=0.01)
+        serial = get_records(1, 'user', [2], date(2019, 1, 1), date(2024, 12, 31),
+                             concurrency=1)
+        parallel = get_records(1, 'user', [2], date(2019, 1, 1), date(2024, 12, 31),
+                               concurrency=6)
+
+        self.assertEqual([r['id'] for r in serial], [r['id'] for r in parallel])
+        self.assertEqual(len(parallel), len(self.records))
+
+    @patch('toggl2github.toggl.get_session')
+    def test_years_are_fetched_in_parallel(self, mock_get_session: MagicMock):
+        mock_get_session.return_value = MockReportsSession(self.records, latency=0.1)
+
+        start = time.perf_counter()
+        get_records(1, 'user', [2], date(2019, 1, 1), date(2024, 12, 31), concurrency=6)
+
+        # 6 years x 2 requests each, sequentially this would take 1.2s
+        self.assertLess(time.perf_counter() - start, 0.6)
+
+
+class TestTaskCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.records = [mock_record(i, start + timedelta(days=i), description=f'#{i % 3} Task')
+                        for i in range(9)]
+
+    def test_entries_are_fetched_once(self):
+        with patch.object(Project, 'fetch_entries', autospec=True,
+                          side_effect=lambda p: setattr(p, '_entries', [])) as mock_fetch:
+            self.project.entries
+            self.project.tasks
+            self.project.get_task('#1 task')
+            self.assertEqual(mock_fetch.call_count, 1)
+
+            self.project.invalidate()
+            self.project.entries
+            self.assertEqual(mock_fetch.call_count, 2)
+
+    @patch('toggl2github.toggl.get_session')
+    def test_tasks_group_entries(self, mock_get_session: MagicMock):
+        mock_get_session.return_value = MockReportsSession(self.records,
+                                                           created_at='2024-01-01T00:00:00+00:00')
+        self.project.fetch_entries(use_cache=False)
+
+        tasks = {t.description: t for t in self.project.tasks}
+        self.assertEqual(sorted(tasks), ['#0 Task', '#1 Task', '#2 Task'])
+        self.assertEqual(sorted(e.id for e in tasks['#1 Task'].entries), [1, 4, 7])
+        self.assertIs(self.project.get_task('#1 TASK'), tasks['#1 Task'])
+        self.assertIsNone(self.project.get_task('#3 Task'))
+
+
+class LegacyEntry:
+    """How entries used to be stored: every field as an attribute plus the raw record."""
+
+    def __init__(self, **kwargs):
+        for key in ['id', 'workspace_id', 'project_id', 'billable', 'description', 'tags',
+                    'tag_ids', 'duronly', 'at', 'server_deleted_at', 'user_id', 'uid', 'wid', 'pid']:
+            setattr(self, key, kwargs.get(key, None))
+        self.start = datetime.fromisoformat(kwargs['start'])
+        self.stop = datetime.fromisoformat(kwargs['stop'])
+        self.json = kwargs
+
+
+def report_record(i) -> dict:
+    """A record shaped like a flattened row of the reports api."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)
+    return {'user_id': 1, 'username': 'user', 'project_id': 2, 'task_id': None,
+            'billable': False, 'description': f'#{i % 50} Task', 'tag_ids': [],
+            'billable_amount_in_cents': None, 'hourly_rate_in_cents': None, 'currency': 'USD',
+            'row_number': i, 'id': 10**9 + i, 'seconds': 3600, 'start': start.isoformat(),
+            'stop': (start + timedelta(hours=1)).isoformat(), 'at': start.isoformat(),
+            'at_tz': start.isoformat()}
+
+
+class TestModels(unittest.TestCase):
+
+    def test_entry_fields(self):
+        entry = Entry(**report_record(0))
+
+        self.assertEqual(entry.start, datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(entry.duration, 3600)
+        self.assertIsNone(entry.json)
+        self.assertEqual(Entry(keep_json=True, **report_record(0)).json, report_record(0))
+        self.assertFalse(hasattr(entry, '__dict__'))
+
+    def test_running_entry_lasts_until_now(self):
+        start = datetime.now(timezone.utc) - timedelta(minutes=5)
+        entry = Entry(id=1, description='#1 Task', start=start.isoformat(), stop=None)
+        self.assertAlmostEqual(entry.duration, 300, delta=5)
+
+    def test_task_uses_first_entry(self):
+        task = Task([Entry(**report_record(i)) for i in range(3)])
+
+        self.assertEqual(task.id, 10**9)
+        self.assertEqual(task.user_id, 1)
+        self.assertEqual(task.duration, 3 * 3600)
+        self.assertEqual(task.stop, datetime(2024, 1, 1, 1, 2, tzinfo=timezone.utc))
+        with self.assertRaises(AttributeError):
+            task.username
+
+    def test_entry_footprint(self):
+        def footprint(model, n=2000) -> float:
+            tracemalloc.start()
+            entries = [model(**report_record(i)) for i in range(n)]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del entries
+            return size / n
+
+        self.assertGreaterEqual(footprint(LegacyEntry) / footprint(Entry), 3)
+
+
+@unittest.skipUnless(find_spec('pandas'), 'requires pandas')
+class TestColumnarTotals(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        self.project._entries = [Entry(**report_record(i)) for i in range(1000)]
+
+    def test_totals_match_tasks(self):
+        totals = self.project.task_totals()
+
+        for task in self.project.tasks:
+            self.assertEqual(totals.loc[task.description, 'duration'], task.duration)
+            self.assertEqual(totals.loc[task.description, 'start'], task.start.timestamp())
+            self.assertEqual(totals.loc[task.description, 'stop'], task.stop.timestamp())
+
+        self.assertEqual(self.project.durations(),
+                         {t.description: t.duration for t in self.project.tasks})
+        self.assertEqual(str(self.project.to_frame()['description'].dtype), 'category')
+
+    def test_aggregates_a_million_entries_quickly(self):
+        import numpy as np
+        import pandas as pd
+
+        n = 10**6
+        start = time.perf_counter()
+        frame = pd.DataFrame({
+            'description': pd.Categorical.from_codes(np.arange(n) % 5000,
+                                                     [f'#{i} Task' for i in range(5000)]),
+            'start': np.arange(n, dtype=np.int64),
+            'stop': np.arange(n, dtype=np.int64) + 3600,
+        })
+        with patch.object(Project, 'to_frame', return_value=frame):
+            totals = self.project.task_totals()
+
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(len(totals), 5000)
+        self.assertEqual(totals['duration'].sum(), n * 3600)
+
+
+class TestTimeWindow(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        self.records = [report_record(i * 24 * 60) for i in range(10)]
+        self.project._entries = [Entry(**r) for r in self.records]
+
+    def test_durations_in_window(self):
+        durations = self.project.durations(since=date(2024, 1, 3), until=date(2024, 1, 5))
+
+        self.assertEqual(durations, {r['description']: 3600 for r in self.records[2:5]})
+
+    @patch('toggl2github.toggl.get_session')
+    def test_summary_durations(self, mock_get_session: MagicMock):
+        summary = {'groups': [{'id': 2, 'sub_groups': [{'title': '#1 Task', 'seconds': 60},
+                                                       {'title': '#2 Task', 'seconds': 30}]},
+                              {'id': 3, 'sub_groups': [{'title': '#1 Task', 'seconds': 10}]}]}
+        post = mock_get_session.return_value.post
+        post.return_value = MagicMock(status_code=200, json=MagicMock(return_value=summary))
+
+        durations = get_summary_durations(1, 'user', [2, 3], date(2023, 6, 1), date(2024, 2, 1))
+
+        self.assertEqual(durations, {2: {'#1 Task': 120, '#2 Task': 60}, 3: {'#1 Task': 20}})
+        self.assertEqual([c.kwargs['json']['start_date'] for c in post.call_args_list],
+                         ['2023-06-01', '2024-01-01'])
+        self.assertTrue(all(c.args[0].endswith('/workspace/1/summary/time_entries')
+                            for c in post.call_args_list))
+
+        post.reset_mock()
+        self.assertEqual(self.project.durations(date(2024, 1, 1), date(2024, 1, 31), summary=True),
+                         {'#1 Task': 60, '#2 Task': 30})
+        post.assert_called_once()
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.project = Project('user', id=2, workspace_id=1, name='Test')
+        self.records = [report_record(i) for i in range(25)]
+
+    @patch('toggl2github.toggl.PAGE_SIZE', 10)
+    @patch('toggl2github.toggl.get_session')
+    def test_iter_entries_yields_page_by_page(self, mock_get_session: MagicMock):
+        session = mock_get_session.return_value = MockReportsSession(self.records)
+        session.post = MagicMock(wraps=session.post)
+
+        entries = self.project.iter_entries(date(2024, 1, 1), date(2024, 12, 31))
+
+        self.assertEqual(next(entries).id, 10**9)
+        self.assertEqual(session.post.call_count, 1)
+        self.assertEqual(len(list(entries)), 24)
+        self.assertEqual(session.post.call_count, 4)
+
+    def test_aggregate_entries(self):
+        totals = aggregate_entries(Entry(**r) for r in self.records)
+        tasks = {d: Task([Entry(**r) for r in self.records if r['description'] == d])
+                 for d in {r['description'] for r in self.records}}
+
+        self.assertEqual(sorted(totals), sorted(tasks))
+        for description, total in totals.items():
+            self.assertEqual(total.duration, tasks[description].duration)
+            self.assertEqual(total.start, tasks[description].start.timestamp())
+            self.assertEqual(total.stop, tasks[description].stop.timestamp())
@@ -1,8 +1,12 @@
 import logging
-from .toggl2github import sync
+from .toggl2github import SYNC_CONCURRENCY, apply_plan, sync, sync_all
 from .config import set_config
+from .daemon import DEBOUNCE, HOST, PORT, run
+from .metrics import METRICS
 import argparse
 import sys
+from datetime import date
+from pathlib import Path
 
 
 def main():
@@ -14,10 +18,85 @@ def main():
     sync_parser = subparsers.add_parser('sync')
 
     sync_parser.add_argument('toggl_project_name',
-                             help='The name of the Toggl project')
+                             help='The name of the Toggl project',
+                             nargs='?')
     sync_parser.add_argument('github_project_number',
                              help='The number of the Github project',
-                             type=int)
+                             type=int,
+                             nargs='?')
+    sync_parser.add_argument('--async',
+                             help='Download from Toggl and Github concurrently (requires aiohttp)',
+                             action='store_true',
+                             dest='use_async')
+    plan_group = sync_parser.add_mutually_exclusive_group()
+    plan_group.add_argument('--plan',
+                            help='Write the changes to this file instead of making them',
+                            type=Path,
+                            dest='plan_file')
+    plan_group.add_argument('--apply',
+                            help='Make the changes in a file written by --plan, without '
+                            'downloading anything',
+                            type=Path,
+                            dest='apply_file')
+    sync_parser.add_argument('--no-cache',
+                             help='Stream the Toggl entries instead of keeping them on disk, '
+                             'which uses less memory but downloads everything every time',
+                             action='store_false',
+                             dest='use_cache')
+
+    sync_all_parser = subparsers.add_parser('sync-all')
+
+    sync_all_parser.add_argument('mapping_file',
+                                 help='A JSON or YAML file mapping Toggl project names to Github '
+                                 'project numbers')
+    sync_all_parser.add_argument('--concurrency',
+                                 help='The number of Github projects to update at once',
+                                 type=int,
+                                 default=SYNC_CONCURRENCY)
+
+    for sub_parser in [sync_parser, sync_all_parser]:
+        sub_parser.add_argument('--since',
+                                help='Only count time from this date (YYYY-MM-DD)',
+                                type=date.fromisoformat)
+        sub_parser.add_argument('--until',
+                                help='Only count time up to this date (YYYY-MM-DD)',
+                                type=date.fromisoformat)
+        sub_parser.add_argument('--summary',
+                                help='Use the Toggl summary report instead of downloading every '
+                                'time entry',
+                                action='store_true')
+        sub_parser.add_argument('--profile',
+                                help='Print the requests made per endpoint and the time spent in '
+                                'each phase when done',
+                                action='store_true')
+        sub_parser.add_argument('--profile-output',
+                                help='Write the profile to this file instead, as JSON if it ends '
+                                'in .json, otherwise as Prometheus text',
+                                type=Path)
+        sub_parser.add_argument('--refresh-metadata',
+                                help='Download the Github project fields again instead of using '
+                                'the stored ones',
+                                action='store_true')
+
+    daemon_parser = subparsers.add_parser('daemon')
+
+    daemon_parser.add_argument('mapping_file',
+                               help='A JSON or YAML file mapping Toggl project names to Github '
+                               'project numbers')
+    daemon_parser.add_argument('--host',
+                               help='The address to listen for Toggl webhooks on',
+                               default=HOST)
+    daemon_parser.add_argument('--port',
+                               help='The port to listen for Toggl webhooks on',
+                               type=int,
+                               default=PORT)
+    daemon_parser.add_argument('--debounce',
+                               help='Seconds to collect changes for before updating Github',
+                               type=float,
+                               default=DEBOUNCE)
+    daemon_parser.add_argument('--secret',
+                               help='The secret of the Toggl webhook subscription, used to verify '
+                               'events. Required unless listening on a loopback address')
 
     config_parser = subparsers.add_parser('config')
     config_parser.add_argument('--gh_user', help='Github user')
@@ -28,8 +107,59 @@ def main():
 
     args = parser.parse_args()
 
+    if (getattr(args, 'since', None) is not None and getattr(args, 'until', None) is not None
+            and args.since > args.until):
+        parser.error('--since must not be after --until')
+
     if args.command == 'sync':
-        sync(args.toggl_project_name, args.github_project_number)
+        has_projects = (args.toggl_project_name is not None
+                        or args.github_project_number is not None)
+        if args.apply_file is not None and has_projects:
+            parser.error('--apply takes the projects from the plan')
+        elif args.apply_file is None and not has_projects:
+            parser.error('toggl_project_name and github_project_number are required')
+        elif args.use_async and (args.plan_file or args.apply_file):
+            parser.error('--async can\'t be used with --plan or --apply')
+
+    try:
+        run_command(args)
+    finally:
+        if getattr(args, 'profile_output', None) is not None:
+            write_profile(args.profile_output)
+        elif getattr(args, 'profile', False):
+            print(METRICS.format_table(), file=sys.stderr)
+
+
+def write_profile(path: Path):
+    if path.suffix.lower() == '.json':
+        path.write_text(METRICS.to_json())
+    else:
+        path.write_text(METRICS.to_prometheus())
+
+
+def run_command(args: argparse.Namespace):
+
+    if args.command == 'sync' and args.apply_file is not None:
+        apply_plan(args.apply_file)
+
+    elif args.command == 'sync' and args.use_async:
+        import asyncio
+
+        from .aio import sync_async
+        asyncio.run(sync_async(args.toggl_project_name, args.github_project_number,
+                               since=args.since, until=args.until, summary=args.summary,
+                               refresh_metadata=args.refresh_metadata))
+
+    elif args.command == 'sync':
+        sync(args.toggl_project_name, args.github_project_number, args.since, args.until,
+             args.summary, args.refresh_metadata, args.plan_file, args.use_cache)
+
+    elif args.command == 'sync-all':
+        sync_all(args.mapping_file, args.concurrency, args.since, args.until, args.summary,
+                 args.refresh_metadata)
+
+    elif args.command == 'daemon':
+        run(args.mapping_file, args.host, args.port, args.debounce, args.secret)
 
     elif args.command == 'config':
         kwargs = {k: v for k, v in vars(args).items() if v}
@@ -0,0 +1,342 @@
+"""Asyncio versions of the Toggl and Github clients. Requires aiohttp
+(`pip install toggl2github[async]`)."""
+import asyncio
+import json
+import logging
+import time
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from . import githubpy, toggl
+from .cache import MetadataStore
+from .config import get_config
+from .metrics import METRICS, endpoint, size
+from .session import MAX_RETRIES, POOL_SIZE, TIMEOUT, RateLimiter, RequestStats, backoff
+from .session import retry_delay
+from .toggl import Project, report_end_date
+from .toggl2github import index_issues, log_results, plan_updates
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+CONCURRENCY = 8
+LOG = logging.getLogger(__name__)
+
+
+class AsyncSession:
+    """An aiohttp session with default headers and timeout (in seconds) that allows at most
+    `concurrency` requests in flight at once. Use as an async context manager."""
+
+    def __init__(self, headers: Dict[str, str] = None, concurrency=CONCURRENCY,
+                 pool_size=POOL_SIZE, timeout=TIMEOUT, max_retries=MAX_RETRIES):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for the async clients: pip install aiohttp')
+
+        self.headers = headers or {}
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter()
+        self.stats = RequestStats()
+        self._session: aiohttp.ClientSession = None
+        self._semaphore: asyncio.Semaphore = None
+
+    async def __aenter__(self) -> 'AsyncSession':
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def request(self, method, url, **kwargs) -> Tuple[int, Any]:
+        """Returns the status code and the JSON (or, failing that, text) body of the response.
+        Requests are paced, retried and recorded in `METRICS` the same way as `session.Session`."""
+        (start, status, content, attempt) = (time.perf_counter(), 0, b'', 0)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._sleep(self.rate_limiter.delay())
+                self.stats.add(requests=1, retries=int(attempt > 0))
+
+                try:
+                    async with self._semaphore:
+                        async with self._session.request(method, url, **kwargs) as response:
+                            content = await response.read()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    (status, content) = (0, b'')
+                    if attempt == self.max_retries:
+                        raise
+                    await self._sleep(backoff(attempt))
+                    continue
+
+                status = response.status
+                self.rate_limiter.update(response.headers)
+                delay = retry_delay(status, response.headers, attempt)
+                if delay is None or attempt == self.max_retries:
+                    try:
+                        return status, json.loads(content)
+                    except ValueError:
+                        return status, content.decode(errors='replace')
+
+                await self._sleep(delay)
+
+        finally:
+            METRICS.record_request(endpoint(method, url, kwargs.get('json')),
+                                   time.perf_counter() - start, status, retries=attempt,
+                                   bytes_sent=size(kwargs.get('json') or kwargs.get('data')),
+                                   bytes_received=len(content))
+
+    async def _sleep(self, seconds: float):
+        if seconds > 0:
+            self.stats.add(throttled_seconds=seconds)
+            await asyncio.sleep(seconds)
+
+
+def github_session(token, concurrency=CONCURRENCY) -> AsyncSession:
+    return AsyncSession(headers={'Authorization': f'Bearer {token}',
+                                 'Content-Type': 'application/json'},
+                        concurrency=concurrency)
+
+
+def toggl_session(user: str, concurrency=CONCURRENCY) -> AsyncSession:
+    return AsyncSession(headers={'content-type': 'application/json',
+                                 'Authorization': f'Basic {toggl.get_auth(user)}'},
+                        concurrency=concurrency)
+
+
+async def graphql(session: AsyncSession, payload: Dict[str, str]) -> Dict[str, Any]:
+    (status, body) = await session.request('POST', githubpy.GH_GRAPHQL_URL, json=payload)
+
+    if status != 200:
+        raise Exception(f'Request failed with status code {status}')
+    elif 'errors' in body:
+        raise Exception(body['errors'])
+
+    return body['data']
+
+
+async def get_project_node_id(session: AsyncSession, user, project_number) -> str:
+    data = await graphql(session, githubpy._node_id_payload(user, project_number))
+    return data['user']['projectV2']['id']
+
+
+async def get_project_fields(session: AsyncSession, project_id) -> List[dict]:
+    data = await graphql(session, githubpy._fields_payload(project_id))
+    return data['node']['fields']['nodes']
+
+
+async def iter_project_issues(session: AsyncSession, project_id,
+                              page_size=githubpy.ISSUES_PAGE_SIZE) -> AsyncIterator[dict]:
+    """Yields the issues of a project one page of `page_size` items at a time."""
+    cursor = None
+    while True:
+        items = (await graphql(session, githubpy._items_payload(project_id, page_size, cursor))
+                 )['node']['items']
+
+        incomplete = [item for item in items['nodes']
+                      if item['fieldValues']['pageInfo']['hasNextPage']]
+        remaining = await asyncio.gather(*(
+            _get_remaining_field_values(session, item['id'],
+                                        item['fieldValues']['pageInfo']['endCursor'])
+            for item in incomplete))
+        for item, nodes in zip(incomplete, remaining):
+            item['fieldValues']['nodes'] += nodes
+
+        for item in items['nodes']:
+            yield githubpy._parse_item(item)
+
+        if not items['pageInfo']['hasNextPage']:
+            break
+
+        cursor = items['pageInfo']['endCursor']
+
+
+async def _get_remaining_field_values(session: AsyncSession, item_id, cursor) -> List[dict]:
+    nodes = []
+    while cursor is not None:
+        page = (await graphql(session, githubpy._field_values_payload(item_id, cursor))
+                )['node']['fieldValues']
+        nodes += page['nodes']
+        cursor = page['pageInfo']['endCursor'] if page['pageInfo']['hasNextPage'] else None
+
+    return nodes
+
+
+async def get_project_issues(session: AsyncSession, project_id,
+                             page_size=githubpy.ISSUES_PAGE_SIZE) -> List[dict]:
+    return [issue async for issue in iter_project_issues(session, project_id, page_size)]
+
+
+async def set_field_values(session: AsyncSession, project_id, field_ids: Dict[str, str],
+                           updates: List[Tuple[str, str, str, Any]],
+                           chunk_size=githubpy.MUTATION_CHUNK_SIZE,
+                           store: MetadataStore = None) -> List[Optional[str]]:
+    """Async version of `githubpy.set_field_values`. `field_ids` are keyed by lower-cased field
+    name. Chunks are sent concurrently, subject to the session's concurrency limit. `store` is
+    cleared if Github reports that the project, an item or a field no longer exists."""
+    errors: List[Optional[str]] = [None] * len(updates)
+    stale = []
+
+    async def send(chunk: range, payload: Dict[str, str]):
+        (status, body) = await session.request('POST', githubpy.GH_GRAPHQL_URL, json=payload)
+
+        if status != 200:
+            for i in chunk:
+                errors[i] = errors[i] or f'Request failed with status code {status}'
+        elif githubpy._record_mutation_errors(body, chunk, errors):
+            stale.append(chunk)
+
+    payloads = list(githubpy._mutation_payloads(updates, chunk_size, project_id,
+                                                lambda name: field_ids.get(name.lower()), errors))
+    await asyncio.gather(*(send(chunk, payload) for chunk, payload in payloads))
+
+    if stale and store is not None:
+        store.clear()
+
+    return errors
+
+
+async def get_all_projects(session: AsyncSession, workspace_id: int, user: str) -> List[Project]:
+    (status, body) = await session.request(
+        'GET', f'{toggl.API_ENDPOINT}/workspaces/{workspace_id}/projects')
+
+    if status != 200:
+        raise Exception(f'Error: {status} - {body}')
+
+    return [Project(user, **r) for r in body]
+
+
+async def get_created_at(session: AsyncSession) -> date:
+    (_, body) = await session.request('GET', f'{toggl.API_ENDPOINT}/me')
+    return datetime.fromisoformat(body['created_at']).date()
+
+
+async def get_records(session: AsyncSession, workspace_id: int, project_ids: List[int],
+                      start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """Async version of `toggl.get_records`. All years are requested at once, subject to the
+    session's concurrency limit, and records are returned in year order."""
+    url = f'{toggl.REPORTS_ENDPOINT}/workspace/{workspace_id}/search/time_entries'
+
+    async def get_window(start: date, end: date) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        for i_page in range(99999):
+            (status, body) = await session.request(
+                'POST', url, json=toggl.search_body(project_ids, start, end, i_page))
+
+            if status != 200:
+                raise Exception(f'Error: {status} - {body}')
+
+            if (new_records := toggl.flatten_page(body)) == []:
+                break
+            else:
+                records += new_records
+
+        return records
+
+    windows = await asyncio.gather(*(get_window(*w)
+                                     for w in toggl.report_windows(start_date, end_date)))
+    return [r for records in windows for r in records]
+
+
+async def get_summary_durations(session: AsyncSession, workspace_id: int,
+                                project_ids: List[int], since: date,
+                                until: date) -> Dict[int, Dict[str, int]]:
+    """Async version of `toggl.get_summary_durations`. All years are requested at once."""
+    url = f'{toggl.REPORTS_ENDPOINT}/workspace/{workspace_id}/summary/time_entries'
+
+    async def get_window(start: date, end: date) -> Dict[str, Any]:
+        (status, body) = await session.request('POST', url,
+                                               json=toggl.summary_body(project_ids, start, end))
+        if status != 200:
+            raise Exception(f'Error: {status} - {body}')
+        return body
+
+    durations: Dict[int, Dict[str, int]] = {}
+    for summary in await asyncio.gather(*(get_window(*w)
+                                          for w in toggl.report_windows(since, until))):
+        toggl.add_summary(durations, summary)
+
+    return durations
+
+
+async def fetch_project_entries(session: AsyncSession, projects: List[Project], use_cache=True,
+                                lookback_days=toggl.LOOKBACK_DAYS):
+    """Async version of `toggl.fetch_project_entries`."""
+    if not projects:
+        return
+
+    fetch = toggl.IncrementalFetch(projects, use_cache, lookback_days)
+
+    start_date = fetch.start_date or await get_created_at(session)
+    fetch.finish(start_date, await get_records(session, projects[0].workspace_id,
+                                               fetch.project_ids, start_date,
+                                               report_end_date()))
+
+
+async def sync_async(toggl_project_name: str, github_project_number: int,
+                     concurrency=CONCURRENCY, since: date = None, until: date = None,
+                     summary=False, refresh_metadata=False):
+    """Same as `toggl2github.sync`, but the Toggl entries and the Github project are downloaded
+    at the same time."""
+    (workspace_id, toggl_user, gh_user, gh_token) = get_config(['toggl_workspace_id',
+                                                                'toggl_user',
+                                                                'gh_user',
+                                                                'gh_token']).values()
+
+    async with toggl_session(toggl_user, concurrency) as t_session, \
+            github_session(gh_token, concurrency) as gh_session:
+
+        async def get_durations() -> Dict[str, int]:
+            project = next((p for p in await get_all_projects(t_session, workspace_id, toggl_user)
+                            if p.name.lower() == toggl_project_name.lower()), None)
+            if project is None:
+                raise ValueError(f'Toggl project {toggl_project_name} not found')
+
+            if summary:
+                return (await get_summary_durations(
+                    t_session, workspace_id, [project.id],
+                    since or await get_created_at(t_session),
+                    until or report_end_date())).get(project.id, {})
+
+            await fetch_project_entries(t_session, [project])
+            return project.durations(since, until)
+
+        store = MetadataStore(gh_user, github_project_number)
+
+        async def get_project() -> Tuple[str, List[dict], bool, Dict[Tuple[int, str], dict]]:
+            if not refresh_metadata and (cached := store.load()):
+                (project_id, fields) = cached
+                return project_id, fields, True, index_issues(
+                    await get_project_issues(gh_session, project_id))
+
+            project_id = await get_project_node_id(gh_session, gh_user, github_project_number)
+            (fields, issues) = await asyncio.gather(get_project_fields(gh_session, project_id),
+                                                    get_project_issues(gh_session, project_id))
+            store.save(project_id, fields)
+            return project_id, fields, False, index_issues(issues)
+
+        with METRICS.phase('download'):
+            (durations, (project_id, fields, is_cached, issues)) = await asyncio.gather(
+                get_durations(), get_project())
+
+        with METRICS.phase('match'):
+            (updates, descriptions, n_unchanged) = plan_updates(durations, issues, gh_user)
+
+        with METRICS.phase('github.update'):
+            field_ids = githubpy.index_fields(fields)
+            if is_cached and any(name.lower() not in field_ids for _, name, *_ in updates):
+                # As in `ProjectContext.field_id`, stored fields may predate the field
+                fields = await get_project_fields(gh_session, project_id)
+                store.save(project_id, fields)
+                field_ids = githubpy.index_fields(fields)
+
+            errors = await set_field_values(gh_session, project_id, field_ids, updates,
+                                            store=store)
+
+    log_results(descriptions, errors, n_unchanged)
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config
+
+HTTP_CACHE_SIZE = 50 * 2**20
+METADATA_TTL = 24 * 3600
+
+
+class EntryStore:
+    """An on-disk store of the raw Toggl time entries of a project, along with the time they were
+    last fetched (the watermark)."""
+
+    def __init__(self, workspace_id, project_id, directory: Path = None):
+        self.workspace_id = workspace_id
+        self.project_id = project_id
+        self.directory = Path(directory) if directory is not None else config.CACHE_DIR
+
+    def __repr__(self) -> str:
+        return f'<EntryStore>: {self.path}'
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f'entries_{self.workspace_id}_{self.project_id}.json'
+
+    def load(self) -> Tuple[Optional[datetime], Dict[str, Dict[str, Any]]]:
+        """Returns the watermark and the stored entries keyed by id. The watermark is None if
+        nothing has been stored yet."""
+        if not self.path.exists():
+            return None, {}
+
+        with self.path.open('r') as f:
+            data = json.load(f)
+
+        return datetime.fromisoformat(data['watermark']), data['entries']
+
+    def save(self, watermark: datetime, entries: Dict[str, Dict[str, Any]]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so an interrupted run can't leave a corrupt store
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump({'watermark': watermark.isoformat(), 'entries': entries}, f)
+        tmp_path.replace(self.path)
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+class MetadataStore:
+    """An on-disk store of the node id and fields (including single select options and
+    iterations) of a Github project, which are considered fresh for `ttl` seconds."""
+
+    def __init__(self, user, project_number, ttl=METADATA_TTL, directory: Path = None):
+        self.user = user
+        self.project_number = project_number
+        self.ttl = ttl
+        self.directory = Path(directory) if directory is not None else config.CACHE_DIR
+
+    def __repr__(self) -> str:
+        return f'<MetadataStore>: {self.path}'
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f'project_{self.user}_{self.project_number}.json'
+
+    def load(self) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Returns the project id and fields, or None if nothing is stored or it has expired."""
+        if not self.path.exists():
+            return None
+
+        with self.path.open('r') as f:
+            data = json.load(f)
+
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(data['fetched_at'])
+        if age.total_seconds() > self.ttl:
+            return None
+
+        return data['project_id'], data['fields']
+
+    def save(self, project_id: str, fields: List[Dict[str, Any]]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump({'fetched_at': datetime.now(timezone.utc).isoformat(),
+                       'project_id': project_id,
+                       'fields': fields}, f)
+        tmp_path.replace(self.path)
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+class HttpCache:
+    """An on-disk cache of GET responses for revalidating with `If-None-Match`. Responses are
+    stored one file per url (and credentials) along with their ETag, and the least recently used
+    are evicted once the cache grows past `max_bytes`.
+
+    The size of the cache is counted once per directory and then kept up to date as responses are
+    stored, so the directory is only scanned again when it needs evicting."""
+
+    def __init__(self, directory: Path = None, max_bytes=HTTP_CACHE_SIZE):
+        self._directory = Path(directory) if directory is not None else None
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._sizes: Dict[Path, int] = {}
+
+    def __repr__(self) -> str:
+        return f'<HttpCache>: {self.directory}'
+
+    @property
+    def directory(self) -> Path:
+        return self._directory if self._directory is not None else config.CACHE_DIR / 'http'
+
+    @staticmethod
+    def key(url: str, authorization: str = None) -> str:
+        """The key of a (full, including query string) url requested with `authorization`, so
+        different credentials never share a response."""
+        return hashlib.sha256(f'{authorization}\n{url}'.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Returns the stored `etag` and `content` for `key`, or None if nothing is stored."""
+        path = self.directory / f'{key}.json'
+        try:
+            with path.open('r') as f:
+                cached = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return cached
+
+    def put(self, key: str, etag: str, content: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{key}.json'
+
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+
+        tmp_path = path.with_suffix(f'.{os.getpid()}.{get_ident()}.tmp')
+        with tmp_path.open('w') as f:
+            json.dump({'etag': etag, 'content': content}, f)
+        new_size = tmp_path.stat().st_size
+        tmp_path.replace(path)
+
+        with self._lock:
+            size = self._sizes.get(self.directory)
+            if size is not None:
+                size = self._sizes[self.directory] = size + new_size - old_size
+
+        if size is None or size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used responses until the cache fits in `max_bytes`."""
+        with self._lock:
+            files = []
+            for path in self.directory.glob('*.json'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(f[1] for f in files)
+            for (_, file_size, path) in sorted(files, key=lambda f: f[0]):
+                if size <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                size -= file_size
+
+            self._sizes[self.directory] = size
+
+    def clear(self):
+        for path in self.directory.glob('*.json'):
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._sizes.pop(self.directory, None)
@@ -1,14 +1,18 @@
 import json
 import re
 from pathlib import Path
+from threading import Lock
 from typing import Any, Dict, List
 
-import keyring
-
 CONFIG_FILE = Path.home() / '.toggl2github'
+CACHE_DIR = Path.home() / '.toggl2github_cache'
 
 RE_PASSWORD = re.compile(r'password|pwd|pw|token|secret|pass|auth', re.I)
 
+# Config file contents and keyring lookups, valid while the config file's path and mtime match
+_CACHE: Dict[str, Any] = {'key': None, 'config': {}, 'passwords': {}}
+_CACHE_LOCK = Lock()
+
 
 def set_config(**kwargs):
     """Sets the configuration values in a json in the users home directory. 
@@ -18,6 +22,10 @@ def set_config(**kwargs):
     to store the password in the system keyring. All password kw must be accompanied by a user kw.
 
     """
+    if any(RE_PASSWORD.search(k) for k in kwargs):
+        # keyring is slow to import so only load it when a password is needed
+        import keyring
+
     for key in [k for k in kwargs if RE_PASSWORD.search(k)]:
         if RE_PASSWORD.sub('user', key) not in kwargs:
             raise ValueError(f'You must provide a user for the {key} password')
@@ -37,6 +45,44 @@ def set_config(**kwargs):
     with CONFIG_FILE.open('w') as f:
         json.dump(config, f, indent=4)
 
+    clear_cache()
+
+
+def clear_cache():
+    """Forgets the cached config file contents and keyring passwords."""
+    with _CACHE_LOCK:
+        _CACHE.update(key=None, config={}, passwords={})
+
+
+def _read_config() -> Dict[str, Any]:
+    """Reads the config file, re-parsing it only if it has changed since it was last read."""
+    key = (str(CONFIG_FILE), CONFIG_FILE.stat().st_mtime_ns) if CONFIG_FILE.exists() else None
+
+    with _CACHE_LOCK:
+        if key != _CACHE['key'] or key is None:
+            config = {}
+            if key is not None:
+                with CONFIG_FILE.open('r') as f:
+                    config = json.load(f)
+            _CACHE.update(key=key, config=config, passwords={})
+
+        return dict(_CACHE['config'])
+
+
+def _get_password(key: str, user: str) -> str:
+    """Gets a password from the system keyring, caching it until the config file changes."""
+    with _CACHE_LOCK:
+        if (key, user) in _CACHE['passwords']:
+            return _CACHE['passwords'][(key, user)]
+
+    import keyring
+    password = keyring.get_password(service_name=f'toggl2github.{key}', username=user)
+
+    with _CACHE_LOCK:
+        _CACHE['passwords'][(key, user)] = password
+
+    return password
+
 
 def get_config(keys: List[str]) -> Dict[str, Any]:
     """Gets the configuration values from a json in the users home directory. 
@@ -45,11 +91,12 @@ def get_config(keys: List[str]) -> Dict[str, Any]:
     Behavior is different if the kw contains "password". In this case it uses the keyring library 
     to store the password in the system keyring. All password kw must be accompanied by a user kw.
 
+    # Caching
+    The parsed file and keyring passwords are cached per process and refreshed whenever the
+    config file's modification time changes.
+
     """
-    config = {}
-    if CONFIG_FILE.exists():
-        with CONFIG_FILE.open('r') as f:
-            config = json.load(f)
+    config = _read_config()
 
     missing = [k for k in keys if k not in config and not RE_PASSWORD.search(k)]
     if missing:
@@ -58,10 +105,9 @@ def get_config(keys: List[str]) -> Dict[str, Any]:
 
     for key in [k for k in keys if RE_PASSWORD.search(k)]:
         if RE_PASSWORD.sub('user', key) not in config:
-            raise ValueError(f'You must have a {RE_PASSWORD.sub("user")} in the config '
+            raise ValueError(f'You must have a {RE_PASSWORD.sub("user", key)} in the config '
                              f'file to retrieve {key} from the keyring.')
 
-        config[key] = keyring.get_password(service_name=f'toggl2github.{key}',
-                                           username=config[RE_PASSWORD.sub('user', key)])
+        config[key] = _get_password(key, config[RE_PASSWORD.sub('user', key)])
 
     return {k: config[k] for k in keys}
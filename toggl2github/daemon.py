@@ -0,0 +1,301 @@
+"""Keeps Github projects in step with Toggl as time is tracked by listening for Toggl webhook
+events, instead of recomputing everything in a batch `sync`."""
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .cache import EntryStore
+from .config import get_config
+from .githubpy import ProjectContext, set_field_values
+from .toggl import Entry, Project, fetch_project_entries
+from .toggl2github import index_issues, load_mapping, log_results, match_tasks, plan_updates
+from .toggl2github import resolve_mapping
+
+LOG = logging.getLogger(__name__)
+HOST = '127.0.0.1'
+PORT = 8765
+DEBOUNCE = 5
+ISSUES_REFRESH_INTERVAL = 300
+
+
+class ProjectState:
+    """The time entries and per-task durations (seconds keyed by description) of a Toggl project,
+    kept up to date one webhook event at a time and persisted in the project's `EntryStore`.
+
+    Running entries count up to the time `durations` is read, the same as in a batch `sync`.
+    """
+
+    def __init__(self, project: Project, store: EntryStore):
+        self.project = project
+        self.store = store
+        (self.watermark, self.records) = store.load()
+        self.seconds: Dict[str, Tuple[str, int]] = {}
+        self.running: Dict[str, Tuple[str, int]] = {}
+        self._durations: Dict[str, int] = {}
+        self.dirty = False
+
+        for key, record in self.records.items():
+            self._add(key, record)
+
+    def __repr__(self) -> str:
+        return f'<ProjectState>: {self.project.name} | {len(self.records)} entries'
+
+    @property
+    def durations(self) -> Dict[str, int]:
+        """Seconds keyed by task description."""
+        durations = dict(self._durations)
+        now = int(time.time())
+        for description, start_ts in self.running.values():
+            durations[description] = durations.get(description, 0) + now - start_ts
+        return durations
+
+    def _add(self, key: str, record: Dict[str, Any]):
+        entry = Entry(**record)
+        if entry.stop_ts is None:
+            self.running[key] = (entry.description, entry.start_ts)
+            seconds = 0
+        else:
+            seconds = entry.duration
+        self.seconds[key] = (entry.description, seconds)
+        self._durations[entry.description] = self._durations.get(entry.description, 0) + seconds
+
+    def _remove(self, key: str) -> Optional[str]:
+        if (old := self.seconds.pop(key, None)) is None:
+            return None
+
+        self.records.pop(key, None)
+        self.running.pop(key, None)
+        (description, seconds) = old
+        self._durations[description] -= seconds
+        return description
+
+    def apply(self, action: str, record: Dict[str, Any]) -> Set[str]:
+        """Applies a `created`, `updated` or `deleted` time entry event and returns the
+        descriptions of the tasks whose duration may have changed."""
+        key = str(record['id'])
+        changed = set()
+
+        if (description := self._remove(key)) is not None:
+            changed.add(description)
+
+        if (action != 'deleted' and record.get('project_id') == self.project.id
+                and not record.get('server_deleted_at') and record.get('start')):
+            self.records[key] = record
+            self._add(key, record)
+            changed.add(self.seconds[key][0])
+
+        self.dirty = self.dirty or bool(changed)
+        return changed
+
+    def save(self):
+        # Without a watermark the store hasn't been filled yet and saving would hide its history
+        if self.dirty and self.watermark is not None:
+            self.store.save(self.watermark, self.records)
+            self.dirty = False
+
+
+class Daemon:
+    """Applies Toggl webhook events to the state of the mapped projects and pushes the changed
+    task durations to Github. Events are coalesced for `debounce` seconds after the first one so
+    a burst of edits becomes a single request per Github project."""
+
+    def __init__(self, pairs: List[Tuple[Project, int]], gh_user: str, gh_token: str,
+                 debounce=DEBOUNCE):
+        self.gh_user = gh_user
+        self.gh_token = gh_token
+        self.debounce = debounce
+        self.states = {p.id: ProjectState(p, EntryStore(p.workspace_id, p.id)) for p, _ in pairs}
+        self.numbers: Dict[int, List[int]] = {}
+        for project, number in pairs:
+            self.numbers.setdefault(project.id, []).append(number)
+
+        self.contexts = {n: ProjectContext(gh_user, gh_token, n) for _, n in pairs}
+        self.issues: Dict[int, Dict[Tuple[int, str], dict]] = {}
+        self._issues_fetched_at: Dict[int, float] = {}
+        self._pending: Dict[int, Set[str]] = {}
+        self._timer: Timer = None
+        self._lock = Lock()
+        self._push_lock = Lock()
+
+    def handle(self, event: Dict[str, Any]):
+        """Handles a Toggl webhook event. Anything other than a time entry event is ignored."""
+        metadata = event.get('metadata') or {}
+        payload = event.get('payload')
+        if metadata.get('model') != 'time_entry' or not isinstance(payload, dict):
+            LOG.debug(f'Ignoring event {event.get("event_id")}')
+            return
+
+        with self._lock:
+            for project_id, state in self.states.items():
+                if (changed := state.apply(metadata.get('action'), payload)):
+                    self._pending.setdefault(project_id, set()).update(changed)
+
+            if self._pending and self._timer is None:
+                self._timer = Timer(self.debounce, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Saves the changed projects and pushes the durations of the changed tasks."""
+        with self._lock:
+            (pending, self._pending) = (self._pending, {})
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            durations = {}
+            for p_id, descriptions in pending.items():
+                totals = self.states[p_id].durations
+                durations[p_id] = {d: totals.get(d, 0) for d in descriptions}
+            for project_id in pending:
+                self.states[project_id].save()
+
+        for project_id, project_durations in durations.items():
+            self.push(project_id, project_durations)
+
+    def push_all(self):
+        """Pushes the duration of every task, e.g. to catch up on start up."""
+        with self._lock:
+            durations = {p_id: state.durations for p_id, state in self.states.items()}
+
+        for project_id, project_durations in durations.items():
+            self.push(project_id, project_durations)
+
+    def push(self, project_id: int, durations: Dict[str, int]):
+        for number in self.numbers[project_id]:
+            try:
+                with self._push_lock:
+                    self._push(number, durations)
+            except Exception as e:
+                LOG.error(f'Failed to update Github project {number} - {e}')
+
+    def _push(self, number: int, durations: Dict[str, int]):
+        # Issues are indexed once and kept up to date locally. They are only downloaded again
+        # if a task has no issue, in case it was added since, and then at most every
+        # ISSUES_REFRESH_INTERVAL seconds
+        stale = (number not in self.issues
+                 or (any(issue is None for *_, issue in match_tasks(durations, self.issues[number]))
+                     and time.time() - self._issues_fetched_at[number] > ISSUES_REFRESH_INTERVAL))
+        if stale:
+            self.issues[number] = index_issues(self.contexts[number].iter_issues())
+            self._issues_fetched_at[number] = time.time()
+
+        (updates, descriptions, n_unchanged) = plan_updates(durations, self.issues[number],
+                                                            self.gh_user)
+        if not updates:
+            return
+
+        errors = set_field_values(self.gh_user, self.gh_token, number, updates,
+                                  context=self.contexts[number])
+
+        issues = {issue['id']: issue for issue in self.issues[number].values()}
+        for (item_id, field_name, _, value), error in zip(updates, errors):
+            if error is None:
+                issues[item_id][field_name] = value
+
+        log_results(descriptions, errors, n_unchanged)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: 'WebhookServer'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if not self.server.verify(body, self.headers.get('X-Webhook-Signature-256')):
+            self._respond(401, {'error': 'Invalid signature'})
+            return
+
+        try:
+            event = json.loads(body)
+        except ValueError:
+            self._respond(400, {'error': 'Invalid JSON'})
+            return
+
+        if not isinstance(event, dict):
+            self._respond(400, {'error': 'Expected a JSON object'})
+
+        # Toggl validates new subscriptions by expecting the validation code back
+        elif 'validation_code' in event:
+            self._respond(200, {'validation_code': event['validation_code']})
+
+        else:
+            self.server.sync_daemon.handle(event)
+            self._respond(200, {})
+
+    def _respond(self, status: int, body: Dict[str, Any]):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        LOG.debug(format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """Receives Toggl webhook events for a `Daemon`. If a `secret` is given, events must be signed
+    with it (`X-Webhook-Signature-256`)."""
+
+    def __init__(self, address: Tuple[str, int], sync_daemon: Daemon, secret: str = None):
+        super().__init__(address, WebhookHandler)
+        self.sync_daemon = sync_daemon
+        self.secret = secret
+
+    def verify(self, body: bytes, signature: Optional[str]) -> bool:
+        if self.secret is None:
+            return True
+
+        expected = 'sha256=' + hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        return signature is not None and hmac.compare_digest(expected, signature)
+
+
+def is_loopback(host: str) -> bool:
+    if host.lower() == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def run(mapping_file: Path, host=HOST, port=PORT, debounce=DEBOUNCE, secret: str = None):
+    """Syncs every Toggl project in `mapping_file` (see `toggl2github.sync_all`) once, then keeps
+    them in sync from Toggl webhook events received on `host`:`port` until interrupted.
+
+    A `secret` is required unless `host` is a loopback address, so that nobody else can send
+    events that change Github."""
+    if secret is None and not is_loopback(host):
+        raise ValueError(f'A webhook secret is required to listen on {host}')
+
+    mapping = load_mapping(mapping_file)
+
+    (workspace_id, toggl_user, gh_user, gh_token) = get_config(['toggl_workspace_id',
+                                                                'toggl_user',
+                                                                'gh_user',
+                                                                'gh_token']).values()
+
+    pairs = resolve_mapping(mapping, workspace_id, toggl_user)
+    fetch_project_entries(list({p.id: p for p, _ in pairs}.values()))
+
+    sync_daemon = Daemon(pairs, gh_user, gh_token, debounce)
+    sync_daemon.push_all()
+
+    server = WebhookServer((host, port), sync_daemon, secret)
+    LOG.info(f'Listening for Toggl webhooks on http://{host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sync_daemon.flush()
@@ -1,31 +1,62 @@
 import argparse
+import itertools
+import json
 import logging
 import re
 import sys
-from typing import Dict
-
-import pandas as pd
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
+from .cache import METADATA_TTL, HttpCache, MetadataStore
 from .config import get_config
+from .session import POOL_SIZE, TIMEOUT, Session
 
 GH_GRAPHQL_URL = 'https://api.github.com/graphql'
+GH_REST_URL = 'https://api.github.com'
+ISSUES_PAGE_SIZE = 100
+MUTATION_CHUNK_SIZE = 50
+REST_PAGE_SIZE = 100
+MILESTONE_CONCURRENCY = POOL_SIZE
+# Github errors that mean a stored node id (project, item or field) no longer exists
+RE_STALE_METADATA = re.compile(r'could not resolve to a node', re.I)
+STALE_ERROR_TYPES = {'NOT_FOUND'}
 LOG = logging.getLogger(__name__)
 
 
-def get_project_node_id(user, token, project_number):
+@lru_cache(maxsize=None)
+def get_session(token, pool_size=POOL_SIZE, timeout=TIMEOUT) -> Session:
+    """Returns the pooled session used for all Github requests made with `token`. REST GETs are
+    revalidated against an on-disk ETag cache, and 304s don't count against the rate limit."""
+    return Session(headers={'Authorization': f'Bearer {token}',
+                            'Content-Type': 'application/json'},
+                   pool_size=pool_size,
+                   timeout=timeout,
+                   http_cache=HttpCache())
 
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
 
-    payload = {
+def _node_id_payload(user, project_number) -> Dict[str, str]:
+    return {
         'query': f'query{{user(login: "{user}") {{projectV2(number: {project_number}){{id}}}}}}'
     }
 
+
+def _fields_payload(project_id) -> Dict[str, str]:
+    return {
+        'query': (f'query{{ node(id: "{project_id}") {{ '
+                  '... on ProjectV2 { fields(first: 100) { nodes { '
+                  '... on ProjectV2Field { id name } '
+                  '... on ProjectV2IterationField { id name configuration { iterations { startDate id }}} '
+                  '... on ProjectV2SingleSelectField { id name options { id name }}}}}}}')
+    }
+
+
+def get_project_node_id(user, token, project_number):
+
+    payload = _node_id_payload(user, project_number)
+
     # Send the POST request
-    response = requests.post(GH_GRAPHQL_URL, headers=headers, json=payload)
+    response = get_session(token).post(GH_GRAPHQL_URL, json=payload)
 
     # Check the response status code
     if response.status_code != 200:
@@ -36,22 +67,12 @@ def get_project_node_id(user, token, project_number):
     return response.json()['data']['user']['projectV2']['id']
 
 
-def get_project_issues(user, token, project_number):
-    project_id = get_project_node_id(user, token, project_number)
-
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
-
-    query = '''
-    query {{
-        node(id: "{project_id}") {{
-            ... on ProjectV2 {{
-                items(first: 100) {{
-                    nodes {{
-                        id
-                        fieldValues(first: 100) {{
+FIELD_VALUES_QUERY = '''
+                        fieldValues(first: {page_size}, after: {cursor}) {{
+                            pageInfo {{
+                                hasNextPage
+                                endCursor
+                            }}
                             nodes {{
                                 ... on ProjectV2ItemFieldTextValue {{
                                     text
@@ -86,7 +107,21 @@ def get_project_issues(user, token, project_number):
                                     }}
                                 }}
                             }}
-                        }}
+                        }}'''
+
+
+ITEMS_QUERY = '''
+    query {{
+        node(id: "{project_id}") {{
+            ... on ProjectV2 {{
+                items(first: {page_size}, after: {cursor}) {{
+                    pageInfo {{
+                        hasNextPage
+                        endCursor
+                    }}
+                    nodes {{
+                        id
+                        {field_values}
                         content {{
                             ... on Issue {{
                                 url
@@ -104,64 +139,116 @@ def get_project_issues(user, token, project_number):
     }}
     '''
 
-    payload = {
-        'query': query.format(project_id=project_id)
-    }
+ITEM_FIELD_VALUES_QUERY = '''
+    query {{
+        node(id: "{item_id}") {{
+            ... on ProjectV2Item {{
+                {field_values}
+            }}
+        }}
+    }}
+    '''
 
-    response = requests.post(GH_GRAPHQL_URL, headers=headers, json=payload)
 
-    if response.status_code != 200:
-        raise Exception(f'Request failed with status code {response.status_code}')
-    elif 'errors' in response.json():
-        raise Exception(response.json()['errors'])
+def _items_payload(project_id, page_size, cursor) -> Dict[str, str]:
+    """The payload of the request for the page of project items that follows `cursor`."""
+    field_values = FIELD_VALUES_QUERY.format(page_size=100, cursor='null')
+    return {'query': ITEMS_QUERY.format(project_id=project_id,
+                                        page_size=page_size,
+                                        cursor=json.dumps(cursor),
+                                        field_values=field_values)}
 
-    issues = []
-    for item in response.json()['data']['node']['items']['nodes']:
-        item: Dict[str, dict]
-        issue = {'id': item['id']}
-        for field in (f for f in item['fieldValues']['nodes'] if f != {}):
-            field: dict
-            issue[field.pop('field')['name']] = list(field.values())[0]
 
-        for k, v in item.get('content', {}).items():
+def _field_values_payload(item_id, cursor) -> Dict[str, str]:
+    """The payload of the request for the page of item field values that follows `cursor`."""
+    field_values = FIELD_VALUES_QUERY.format(page_size=100, cursor=json.dumps(cursor))
+    return {'query': ITEM_FIELD_VALUES_QUERY.format(item_id=item_id, field_values=field_values)}
 
-            if not isinstance(v, dict):
-                issue[k] = v
 
-            elif k == 'assignees':
-                issue[k.title()] = [assignee['login'] for assignee in v['nodes']]
+def get_project_issues(user, token, project_number, project_id=None, page_size=ISSUES_PAGE_SIZE):
+    """Yields the issues of a project one page of `page_size` items at a time."""
+    if project_id is None:
+        project_id = get_project_node_id(user, token, project_number)
 
-        issues.append(issue)
+    cursor = None
+    while True:
+        payload = _items_payload(project_id, page_size, cursor)
 
-        if 'url' in issue and (match := re.match(r'.*/issues/(\d+)', issue['url'])):
-            match: re.Match
-            issue['Number'] = int(match.group(1))
-        else:
-            issue['Number'] = None
+        response = get_session(token).post(GH_GRAPHQL_URL, json=payload)
 
-    return issues
+        if response.status_code != 200:
+            raise Exception(f'Request failed with status code {response.status_code}')
+        elif 'errors' in (page := response.json()):
+            raise Exception(page['errors'])
 
+        items = page['data']['node']['items']
+        for item in items['nodes']:
+            item: Dict[str, dict]
+            if item['fieldValues']['pageInfo']['hasNextPage']:
+                item['fieldValues']['nodes'] += _get_remaining_field_values(
+                    token, item['id'], item['fieldValues']['pageInfo']['endCursor'])
 
-def get_project_fields(user, token, project_number):
-    project_id = get_project_node_id(user, token, project_number)
+            yield _parse_item(item)
 
-    # Set the request headers
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
+        if not items['pageInfo']['hasNextPage']:
+            break
+
+        cursor = items['pageInfo']['endCursor']
+
+
+def _get_remaining_field_values(token, item_id, cursor) -> List[dict]:
+    """Gets the field values of a project item that follow `cursor`."""
+    nodes = []
+    while cursor is not None:
+        payload = _field_values_payload(item_id, cursor)
+
+        response = get_session(token).post(GH_GRAPHQL_URL, json=payload)
+
+        if response.status_code != 200:
+            raise Exception(f'Request failed with status code {response.status_code}')
+        elif 'errors' in (page := response.json()):
+            raise Exception(page['errors'])
+
+        page = page['data']['node']['fieldValues']
+        nodes += page['nodes']
+        cursor = page['pageInfo']['endCursor'] if page['pageInfo']['hasNextPage'] else None
+
+    return nodes
+
+
+def _parse_item(item: Dict[str, dict]) -> dict:
+    """Flattens a project item into a dict of field values keyed by field name."""
+    issue = {'id': item['id']}
+    for field in (f for f in item['fieldValues']['nodes'] if f != {}):
+        field: dict
+        issue[field.pop('field')['name']] = list(field.values())[0]
+
+    for k, v in (item.get('content') or {}).items():
+
+        if not isinstance(v, dict):
+            issue[k] = v
+
+        elif k == 'assignees':
+            issue[k.title()] = [assignee['login'] for assignee in v['nodes']]
+
+    if 'url' in issue and (match := re.match(r'.*/issues/(\d+)', issue['url'])):
+        match: re.Match
+        issue['Number'] = int(match.group(1))
+    else:
+        issue['Number'] = None
+
+    return issue
+
+
+def get_project_fields(user, token, project_number, project_id=None):
+    if project_id is None:
+        project_id = get_project_node_id(user, token, project_number)
 
     # Set the request payload
-    payload = {
-        'query': (f'query{{ node(id: "{project_id}") {{ '
-                  '... on ProjectV2 { fields(first: 100) { nodes { '
-                  '... on ProjectV2Field { id name } '
-                  '... on ProjectV2IterationField { id name configuration { iterations { startDate id }}} '
-                  '... on ProjectV2SingleSelectField { id name options { id name }}}}}}}')
-    }
+    payload = _fields_payload(project_id)
 
     # Send the POST request
-    response = requests.post(GH_GRAPHQL_URL, headers=headers, json=payload)
+    response = get_session(token).post(GH_GRAPHQL_URL, json=payload)
 
     # Check the response status code
     if response.status_code != 200:
@@ -183,6 +270,121 @@ def get_project_issue_id(user, token, project_number, title):
                 if issue['Title'] == title), None)
 
 
+def index_fields(fields: List[dict]) -> Dict[str, str]:
+    """Field ids keyed by lower-cased field name."""
+    return {f['name'].lower(): f['id'] for f in fields if 'name' in f}
+
+
+class ProjectContext:
+    """Resolves the node id, fields and items of a Github project once so that repeated field
+    updates don't re-download the whole project for every call.
+
+    The node id and fields rarely change, so they are also kept in a `MetadataStore` for
+    `metadata_ttl` seconds across runs. `refresh_metadata` ignores what is stored.
+    """
+
+    def __init__(self, user, token, project_number, use_cache=True, metadata_ttl=METADATA_TTL,
+                 refresh_metadata=False):
+        self.user = user
+        self.token = token
+        self.project_number = project_number
+        self.store = MetadataStore(user, project_number, metadata_ttl) if use_cache else None
+        self._project_id = None
+        self._fields: List[dict] = None
+        self._field_ids: Dict[str, str] = None
+        self._issues: List[dict] = None
+        self._item_ids: Dict[str, str] = None
+        self._metadata_is_cached = False
+
+        if self.store is not None and not refresh_metadata and (cached := self.store.load()):
+            (self._project_id, self._fields) = cached
+            self._metadata_is_cached = True
+
+    def __repr__(self) -> str:
+        return f'<ProjectContext>: {self.user} #{self.project_number}'
+
+    @classmethod
+    def from_metadata(cls, user, token, project_number, project_id: str,
+                      fields: List[dict]) -> 'ProjectContext':
+        """A context for a project whose node id and fields are already known (e.g. from a saved
+        plan), so nothing is downloaded to update its fields."""
+        context = cls(user, token, project_number, use_cache=False)
+        (context._project_id, context._fields) = (project_id, fields)
+        return context
+
+    @property
+    def project_id(self) -> str:
+        if self._project_id is None:
+            self._project_id = get_project_node_id(self.user, self.token, self.project_number)
+        return self._project_id
+
+    @property
+    def fields(self) -> List[dict]:
+        if self._fields is None:
+            self._fields = get_project_fields(self.user,
+                                              self.token,
+                                              self.project_number,
+                                              project_id=self.project_id)
+            if self.store is not None:
+                self.store.save(self.project_id, self._fields)
+        return self._fields
+
+    @property
+    def field_ids(self) -> Dict[str, str]:
+        """Field ids keyed by lower-cased field name."""
+        if self._field_ids is None:
+            self._field_ids = index_fields(self.fields)
+        return self._field_ids
+
+    def invalidate_metadata(self):
+        """Forgets the node id and fields, here and in the store, so they are downloaded again."""
+        if self.store is not None:
+            self.store.clear()
+        (self._project_id, self._fields, self._field_ids) = (None, None, None)
+        self._metadata_is_cached = False
+
+    @property
+    def issues(self) -> List[dict]:
+        if self._issues is None:
+            self._issues = list(self.iter_issues())
+        return self._issues
+
+    def iter_issues(self) -> Iterator[dict]:
+        """Yields the issues of the project as pages arrive, indexing their item ids on the way.
+        Unlike `issues`, the issues themselves are not kept in memory."""
+        if self._issues is not None:
+            yield from self._issues
+            return
+
+        item_ids = {}
+        for issue in get_project_issues(self.user,
+                                        self.token,
+                                        self.project_number,
+                                        project_id=self.project_id):
+            if 'Title' in issue:
+                item_ids.setdefault(issue['Title'], issue['id'])
+            yield issue
+
+        self._item_ids = item_ids
+
+    @property
+    def item_ids(self) -> Dict[str, str]:
+        """Project item ids keyed by issue title. The first item wins if titles are repeated."""
+        if self._item_ids is None:
+            for _ in self.iter_issues():
+                pass
+        return self._item_ids
+
+    def field_id(self, field_name):
+        """Returns the id of a field, downloading the fields again if it isn't in stored ones."""
+        if field_name.lower() not in self.field_ids and self._metadata_is_cached:
+            self.invalidate_metadata()
+        return self.field_ids.get(field_name.lower())
+
+    def item_id(self, title):
+        return self.item_ids.get(title)
+
+
 def create_issue(user, token, project_number, title, body, field_values: Dict[str, str]):
     ...
 
@@ -193,14 +395,8 @@ def delete_issue(user, token, project_number, title):
 
 def get_issue_details(user, token, repo, issue_id):
 
-    # Set the request headers
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
-
-    url = f'https://api.github.com/repos/{user}/{repo}/issues/{issue_id}'
-    response = requests.get(url, headers=headers)
+    url = f'{GH_REST_URL}/repos/{user}/{repo}/issues/{issue_id}'
+    response = get_session(token).get(url)
 
     # Check the response status code
     if response.status_code == 200 and 'errors' in response.json():
@@ -220,41 +416,38 @@ def get_issue_details(user, token, repo, issue_id):
     return response.json()
 
 
-def set_field_value(user, token, project_number, issue_name, field_name, field_type, value):
-
-    project_id = get_project_node_id(user, token, project_number)
-    field_id = get_project_field_id(user, token, project_number, field_name)
-    issue_id = get_project_issue_id(user, token, project_number, issue_name)
+def _field_value_mutation(alias, project_id, item_id, field_id, field_type, value):
+    """Returns a single (aliased) `updateProjectV2ItemFieldValue` mutation."""
+    if field_type in ['text', 'date', 'singleSelectOptionId', 'iterationId'] or value == '':
+        value = json.dumps(str(value))
 
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
-
-    query = '''
-    mutation {{
-        updateProjectV2ItemFieldValue( 
-        input: {{ 
-            projectId: "{project_id}" 
-            itemId: "{issue_id}" 
-            fieldId: "{field_id}" 
-            value: {{ 
+    return f'''
+        {alias}: updateProjectV2ItemFieldValue(
+        input: {{
+            projectId: "{project_id}"
+            itemId: "{item_id}"
+            fieldId: "{field_id}"
+            value: {{
                 {field_type}: {value}
             }}
-        }}) 
-        {{ projectV2Item {{ id }} }}
-    }}'''
+        }})
+        {{ projectV2Item {{ id }} }}'''
+
 
-    if field_type in ['text', 'date'] or value == '':
-        value = f'"{value}"'
+def set_field_value(user, token, project_number, issue_name, field_name, field_type, value,
+                    context: ProjectContext = None):
 
-    payload = {'query': query.format(project_id=project_id,
-                                     issue_id=issue_id,
-                                     field_id=field_id,
-                                     field_type=field_type,
-                                     value=value)}
+    if context is None:
+        context = ProjectContext(user, token, project_number)
 
-    response = requests.post(GH_GRAPHQL_URL, headers=headers, json=payload)
+    project_id = context.project_id
+    field_id = context.field_id(field_name)
+    issue_id = context.item_id(issue_name)
+
+    mutation = _field_value_mutation('update', project_id, issue_id, field_id, field_type, value)
+    payload = {'query': f'mutation {{{mutation}\n}}'}
+
+    response = get_session(token).post(GH_GRAPHQL_URL, json=payload)
 
     if response.status_code != 200:
         raise Exception(f'Request failed with status code {response.status_code}')
@@ -264,52 +457,187 @@ def set_field_value(user, token, project_number, issue_name, field_name, field_t
     return response.json()
 
 
-def get_milestones(user, token, repo, state='all'):
+def set_field_values(user, token, project_number, updates: List[Tuple[str, str, str, Any]],
+                     chunk_size=MUTATION_CHUNK_SIZE, context: ProjectContext = None):
+    """Sets many project field values using aliased mutations, `chunk_size` per request.
+
+    Parameters
+    ----------
+    updates : List[Tuple[str, str, str, Any]]
+        (item id, field name, field type, value) for each update
+    chunk_size : int
+        Maximum number of mutations sent in a single request
+
+    Returns
+    -------
+    List[Optional[str]]
+        An error message for each update that failed, None for each that succeeded, in the same
+        order as `updates`
+    """
+    if context is None:
+        context = ProjectContext(user, token, project_number)
+
+    errors: List[Optional[str]] = [None] * len(updates)
+    stale = False
+    for chunk, payload in _mutation_payloads(updates, chunk_size, context.project_id,
+                                             context.field_id, errors):
+
+        response = get_session(token).post(GH_GRAPHQL_URL, json=payload)
+
+        if response.status_code != 200:
+            for i in chunk:
+                errors[i] = errors[i] or f'Request failed with status code {response.status_code}'
+            continue
+
+        stale = _record_mutation_errors(response.json(), chunk, errors) or stale
+
+    if stale:
+        LOG.info(f'Unknown field or item in Github project {project_number}, forgetting its '
+                 'stored metadata')
+        context.invalidate_metadata()
+
+    return errors
+
+
+def _mutation_payloads(updates: List[Tuple[str, str, str, Any]], chunk_size, project_id,
+                       field_id: Callable[[str], Optional[str]],
+                       errors: List[Optional[str]]) -> Iterator[Tuple[range, Dict[str, str]]]:
+    """Yields the indices of each chunk of `updates` and the payload of its aliased mutation.
+    Updates whose field can't be found are recorded in `errors` instead."""
+    for i_start in range(0, len(updates), chunk_size):
+        chunk = range(i_start, min(i_start + chunk_size, len(updates)))
+
+        mutations = []
+        for i in chunk:
+            (item_id, field_name, field_type, value) = updates[i]
+            if (f_id := field_id(field_name)) is None:
+                errors[i] = f'Field {field_name} not found in project {project_id}'
+            else:
+                mutations.append(_field_value_mutation(f'u{i}', project_id, item_id,
+                                                       f_id, field_type, value))
+
+        if mutations:
+            yield chunk, {'query': 'mutation {' + ''.join(mutations) + '\n}'}
+
+
+def _record_mutation_errors(result: dict, chunk: range, errors: List[Optional[str]]) -> bool:
+    """Copies the errors of an aliased mutation response into `errors`. Errors are matched to
+    updates by their `u<index>` alias; those without one are applied to the whole chunk.
+
+    Returns True if Github reported that a node id in the mutation doesn't exist, i.e. the stored
+    project metadata is out of date."""
+    stale = False
+    for error in result.get('errors', []):
+        stale = stale or (error.get('type') in STALE_ERROR_TYPES
+                          or bool(RE_STALE_METADATA.search(error.get('message', ''))))
+        path = error.get('path') or []
+        if path and re.fullmatch(r'u\d+', str(path[0])):
+            errors[int(path[0][1:])] = error.get('message', str(error))
+        else:
+            for i in chunk:
+                errors[i] = errors[i] or error.get('message', str(error))
 
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
+    return stale
 
-    url = f'https://api.github.com/repos/{user}/{repo}/milestones'
-    response = requests.get(url, headers=headers, params={'state': state})
+
+def iter_rest_pages(token, url, params: Dict[str, Any] = None,
+                    per_page=REST_PAGE_SIZE) -> Iterator[dict]:
+    """Yields the results of a paginated Github REST GET, requesting `per_page` at a time until a
+    page comes back short."""
+    for page in itertools.count(1):
+        response = get_session(token).get(url, params={**(params or {}),
+                                                       'per_page': per_page,
+                                                       'page': page})
+        response.raise_for_status()
+        results = response.json()
+        yield from results
+        if len(results) < per_page:
+            return
+
+
+def iter_milestones(user, token, repo, state='all') -> Iterator[dict]:
+    """Yields every milestone of `user`/`repo`, following the pages."""
+    yield from iter_rest_pages(token, f'{GH_REST_URL}/repos/{user}/{repo}/milestones',
+                               {'state': state})
+
+
+def get_milestones(user, token, repo, state='all'):
+    import pandas as pd
+
+    return (pd.DataFrame(list(iter_milestones(user, token, repo, state)),
+                         columns=['title',
+                                  'description',
+                                  'number',
+                                  'state',
+                                  'created_at',
+                                  'updated_at',
+                                  'open_issues',
+                                  'closed_issues']))
+
+
+def get_repos(user, token, owner=None) -> List[dict]:
+    """The repos of `owner`, a user or organisation (`user` by default), including the private repos
+    that `token` can see."""
+    if owner is None or owner.lower() == user.lower():
+        return list(iter_rest_pages(token, f'{GH_REST_URL}/user/repos', {'affiliation': 'owner'}))
+
+    response = get_session(token).get(f'{GH_REST_URL}/users/{owner}')
     response.raise_for_status()
-    return (pd.DataFrame(response.json())
-            [['title',
-              'description',
-              'number',
-              'state',
-              'created_at',
-              'updated_at',
-              'open_issues',
-              'closed_issues']])
+    kind = 'orgs' if response.json().get('type') == 'Organization' else 'users'
+    return list(iter_rest_pages(token, f'{GH_REST_URL}/{kind}/{owner}/repos'))
 
 
 def close_milestone(user, token, repo, milestone_number):
 
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
-
-    url = f'https://api.github.com/repos/{user}/{repo}/milestones/{milestone_number}'
-    response = requests.patch(url, headers=headers, data='{"state": "closed"}')
+    url = f'{GH_REST_URL}/repos/{user}/{repo}/milestones/{milestone_number}'
+    response = get_session(token).patch(url, data='{"state": "closed"}')
     response.raise_for_status()
-    LOG.info(f'Milestone {milestone_number} in {user}/repo closed')
+    LOG.info(f'Milestone {milestone_number} in {user}/{repo} closed')
+
+
+def get_completed_milestones(user, token, repo) -> List[int]:
+    """The numbers of the open milestones of `user`/`repo` that have closed issues and no open
+    ones."""
+    return [m['number'] for m in iter_milestones(user, token, repo, state='open')
+            if m['open_issues'] == 0 and m['closed_issues'] > 0]
+
 
+def close_completed_milestones(repo=None, all_repos=False, owner=None,
+                               concurrency=MILESTONE_CONCURRENCY):
+    """Closes the completed milestones of `repo`, or of every unarchived repo if `all_repos` is
+    True. The repos belong to `owner`, a user or organisation (the Github user by default).
 
-def close_completed_milestones(repo):
+    Repos are scanned and milestones closed `concurrency` requests at a time. A repo that can't be
+    scanned or a milestone that can't be closed is logged and skipped.
+    """
+    if (repo is None) == (not all_repos):
+        raise ValueError('Either a repo or all_repos must be given, not both')
 
     (user, token) = get_config(['gh_user', 'gh_token']).values()
-    milestone_numbers = (get_milestones(user, token, repo)
-                         .query('state=="open"')
-                         .query('open_issues==0')
-                         .query('closed_issues>0')
-                         ['number'])
-    for num in milestone_numbers:
-        close_milestone(user, token, repo, num)
-
-    if len(milestone_numbers) == 0:
+    owner = owner or user
+    repos = ([repo] if repo is not None
+             else [r['name'] for r in get_repos(user, token, owner) if not r.get('archived')])
+
+    closes = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        scans = {executor.submit(get_completed_milestones, owner, token, r): r for r in repos}
+        for future in as_completed(scans):
+            try:
+                numbers = future.result()
+            except Exception as e:
+                LOG.warning(f'Failed to get the milestones of {owner}/{scans[future]} - {e}')
+                continue
+            closes.update({executor.submit(close_milestone, owner, token, scans[future], n):
+                           (scans[future], n) for n in numbers})
+
+        for future in as_completed(closes):
+            try:
+                future.result()
+            except Exception as e:
+                (r, n) = closes[future]
+                LOG.warning(f'Failed to close milestone {n} in {owner}/{r} - {e}')
+
+    if len(closes) == 0:
         LOG.info('No milestones to close')
 
 
@@ -321,12 +649,23 @@ def main():
     subparsers = parser.add_subparsers(dest='command')
 
     close_completed_milestones_parser = subparsers.add_parser('close_completed_milestones')
-    close_completed_milestones_parser.add_argument('repo', help='Github repo')
+    repo_group = close_completed_milestones_parser.add_mutually_exclusive_group(required=True)
+    repo_group.add_argument('repo', help='Github repo', nargs='?')
+    repo_group.add_argument('--all-repos',
+                            help='Close the completed milestones of every unarchived repo',
+                            action='store_true')
+    close_completed_milestones_parser.add_argument('--owner',
+                                                   help='The user or organisation that owns the '
+                                                   'repos, the configured Github user if not given')
+    close_completed_milestones_parser.add_argument('--concurrency',
+                                                   help='The number of requests to make at once',
+                                                   type=int,
+                                                   default=MILESTONE_CONCURRENCY)
 
     args = parser.parse_args()
 
     if args.command == 'close_completed_milestones':
-        close_completed_milestones(args.repo)
+        close_completed_milestones(args.repo, args.all_repos, args.owner, args.concurrency)
 
 
 if __name__ == '__main__':
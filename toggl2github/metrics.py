@@ -0,0 +1,204 @@
+"""Counts, latency histograms and payload sizes of the HTTP requests made through the sessions,
+and timings of the phases of a sync. Everything is recorded in `METRICS`."""
+import json
+import re
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import urlparse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RE_ID = re.compile(r'/\d+(?=/|$)')
+RE_GRAPHQL_FIELD = re.compile(r'\b(updateProjectV2ItemFieldValue|fieldValues|items|fields|'
+                              r'projectV2)\b')
+
+
+class Histogram:
+    """Counts observations (seconds) in cumulative `BUCKETS`, as Prometheus does."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'sum': self.sum, 'max': self.max,
+                'buckets': dict(zip(map(str, BUCKETS), self.buckets))}
+
+
+class EndpointStats:
+    __slots__ = ('calls', 'errors', 'retries', 'bytes_sent', 'bytes_received', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'errors': self.errors, 'retries': self.retries,
+                'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received,
+                'latency': self.latency.to_dict()}
+
+
+def endpoint(method: str, url: str, payload: Any = None) -> str:
+    """A label for the endpoint of a request, with numeric ids replaced by `{id}` so that requests
+    for different objects share a label. Github GraphQL requests are labelled by the first field
+    they select or mutate."""
+    parsed = urlparse(url)
+    label = f'{method.upper()} {parsed.netloc}{RE_ID.sub("/{id}", parsed.path)}'
+
+    if isinstance(payload, dict) and isinstance(payload.get('query'), str):
+        if (match := RE_GRAPHQL_FIELD.search(payload['query'])):
+            label += f' {match.group(1)}'
+
+    return label
+
+
+def size(content: Any) -> int:
+    """The size in bytes of a request or response body."""
+    if isinstance(content, (bytes, bytearray)):
+        return len(content)
+    elif isinstance(content, str):
+        return len(content.encode())
+    elif isinstance(content, (dict, list)):
+        return len(json.dumps(content).encode())
+    return 0
+
+
+class Metrics:
+    """Request statistics keyed by `endpoint` label and phase timings keyed by name, which can be
+    printed with `format_table` or exported with `to_json` and `to_prometheus`."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.phases: Dict[str, Histogram] = {}
+
+    def __repr__(self) -> str:
+        return (f'<Metrics>: {sum(e.calls for e in self.endpoints.values())} requests | '
+                f'{len(self.phases)} phases')
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.phases = {}
+
+    def record_request(self, label: str, seconds: float, status: int, retries=0, bytes_sent=0,
+                       bytes_received=0):
+        """Records a request, including all its retries. `status` is 0 if it never got a
+        response."""
+        with self._lock:
+            stats = self.endpoints.setdefault(label, EndpointStats())
+            stats.calls += 1
+            stats.errors += int(status == 0 or status >= 400)
+            stats.retries += retries
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.latency.observe(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the body of the `with` block as phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.setdefault(name, Histogram()).observe(time.perf_counter() - start)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'endpoints': {k: v.to_dict() for k, v in self.endpoints.items()},
+                    'phases': {k: v.to_dict() for k, v in self.phases.items()}}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            endpoints = dict(self.endpoints)
+            phases = dict(self.phases)
+
+        lines: List[str] = []
+
+        def metric(name, kind, help_text, samples: List[Tuple[str, Dict[str, str], Any]]):
+            lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'])
+            lines.extend(f'{name}{suffix}{_labels(labels)} {value}'
+                         for suffix, labels, value in samples)
+
+        def histogram(name, help_text, key, histograms: Dict[str, Histogram]):
+            samples = []
+            for label, h in histograms.items():
+                samples += [('_bucket', {key: label, 'le': str(b)}, n)
+                            for b, n in zip(BUCKETS, h.buckets)]
+                samples += [('_bucket', {key: label, 'le': '+Inf'}, h.count),
+                            ('_sum', {key: label}, h.sum),
+                            ('_count', {key: label}, h.count)]
+            metric(name, 'histogram', help_text, samples)
+
+        metric('toggl2github_requests_total', 'counter', 'Requests made, not counting retries',
+               [('', {'endpoint': k}, e.calls) for k, e in endpoints.items()])
+        metric('toggl2github_request_errors_total', 'counter', 'Requests that failed',
+               [('', {'endpoint': k}, e.errors) for k, e in endpoints.items()])
+        metric('toggl2github_request_retries_total', 'counter', 'Retries of requests',
+               [('', {'endpoint': k}, e.retries) for k, e in endpoints.items()])
+        metric('toggl2github_request_bytes_total', 'counter', 'Bytes of request/response bodies',
+               [('', {'endpoint': k, 'direction': 'sent'}, e.bytes_sent)
+                for k, e in endpoints.items()]
+               + [('', {'endpoint': k, 'direction': 'received'}, e.bytes_received)
+                  for k, e in endpoints.items()])
+        histogram('toggl2github_request_duration_seconds', 'Request latency including retries',
+                  'endpoint', {k: e.latency for k, e in endpoints.items()})
+        histogram('toggl2github_phase_duration_seconds', 'Duration of the phases of a sync',
+                  'phase', phases)
+
+        return '\n'.join(lines) + '\n'
+
+    def format_table(self) -> str:
+        """A summary of the requests per endpoint and the phases, for printing."""
+        with self._lock:
+            endpoints = sorted(self.endpoints.items(), key=lambda e: -e[1].latency.sum)
+            phases = list(self.phases.items())
+
+        width = max([len('endpoint')] + [len(k) for k, _ in endpoints])
+        lines = [f'{"endpoint":<{width}} {"calls":>6} {"errors":>6} {"retries":>7} '
+                 f'{"sent KB":>8} {"recv KB":>8} {"total s":>8} {"mean ms":>8} {"max ms":>8}']
+        for label, e in endpoints:
+            lines.append(f'{label:<{width}} {e.calls:>6} {e.errors:>6} {e.retries:>7} '
+                         f'{e.bytes_sent / 1024:>8.1f} {e.bytes_received / 1024:>8.1f} '
+                         f'{e.latency.sum:>8.2f} {e.latency.mean * 1000:>8.1f} '
+                         f'{e.latency.max * 1000:>8.1f}')
+
+        if phases:
+            width = max([len('phase')] + [len(k) for k, _ in phases])
+            lines += ['', f'{"phase":<{width}} {"calls":>6} {"total s":>8}']
+            lines += [f'{name:<{width}} {h.count:>6} {h.sum:>8.2f}' for name, h in phases]
+
+        return '\n'.join(lines)
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+METRICS = Metrics()
@@ -0,0 +1,190 @@
+import random
+import time
+from threading import Lock
+from typing import Dict, Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import HttpCache
+from .metrics import METRICS, endpoint, size
+
+POOL_SIZE = 10
+TIMEOUT = 30
+MAX_RETRIES = 5
+BACKOFF = 1
+MAX_BACKOFF = 60
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RequestStats:
+    """Counts the requests made through a session, how many were retries and how long was spent
+    waiting on rate limits and backoff."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.not_modified = 0
+        self.throttled_seconds = 0.0
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return (f'<RequestStats>: {self.requests} requests | {self.retries} retries | '
+                f'{self.not_modified} not modified | {self.throttled_seconds:.1f} s throttled')
+
+    def add(self, requests=0, retries=0, not_modified=0, throttled_seconds=0.0):
+        with self._lock:
+            self.requests += requests
+            self.retries += retries
+            self.not_modified += not_modified
+            self.throttled_seconds += throttled_seconds
+
+
+class RateLimiter:
+    """Keeps track of when requests may resume based on the rate limit headers of responses.
+
+    `X-RateLimit-Remaining`/`X-RateLimit-Reset` (Github) hold requests back until the reset time
+    once fewer than `min_remaining` requests are left, and `Retry-After` (Github and Toggl) holds
+    them back for the given number of seconds.
+    """
+
+    def __init__(self, min_remaining=1):
+        self.min_remaining = min_remaining
+        self.resume_at = 0.0
+        self._lock = Lock()
+
+    def delay(self) -> float:
+        """Seconds to wait before the next request may be sent."""
+        return max(0.0, self.resume_at - time.time())
+
+    def update(self, headers: Mapping[str, str]):
+        resume_at = None
+
+        if (retry_after := _retry_after(headers)) is not None:
+            resume_at = time.time() + retry_after
+
+        elif (headers.get('X-RateLimit-Remaining', '').isdigit()
+              and int(headers['X-RateLimit-Remaining']) < self.min_remaining
+              and headers.get('X-RateLimit-Reset', '').isdigit()):
+            resume_at = float(headers['X-RateLimit-Reset'])
+
+        if resume_at is not None:
+            with self._lock:
+                self.resume_at = max(self.resume_at, resume_at)
+
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    try:
+        return float(headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+
+def retry_delay(status_code: int, headers: Mapping[str, str], attempt: int) -> Optional[float]:
+    """Returns how long to wait before retrying a response, or None if it shouldn't be retried.
+
+    429s, 5xx and 403s caused by a rate limit are retried after `Retry-After` if given, otherwise
+    after a jittered exponential backoff.
+    """
+    rate_limited = status_code == 403 and (headers.get('X-RateLimit-Remaining') == '0'
+                                           or 'Retry-After' in headers)
+    if status_code not in RETRY_STATUS_CODES and not rate_limited:
+        return None
+
+    if (retry_after := _retry_after(headers)) is not None:
+        return retry_after
+
+    return backoff(attempt)
+
+
+def backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2**attempt))
+
+
+class Session(requests.Session):
+    """A `requests.Session` with a connection pool of `pool_size` kept-alive connections per host,
+    default headers and a default timeout (in seconds) for every request.
+
+    Requests are paced by a `RateLimiter` and rate limited or failed (5xx, connection errors)
+    requests are retried up to `max_retries` times. Counts are kept in `stats`.
+
+    If an `http_cache` is given, GET responses with an ETag are stored in it and revalidated with
+    `If-None-Match` next time. A 304 is returned to the caller as the cached 200.
+    """
+
+    def __init__(self, headers: Dict[str, str] = None, pool_size=POOL_SIZE, timeout=TIMEOUT,
+                 max_retries=MAX_RETRIES, http_cache: HttpCache = None):
+        super().__init__()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.http_cache = http_cache
+        self.rate_limiter = RateLimiter()
+        self.stats = RequestStats()
+        self.headers.update({'Connection': 'keep-alive', **(headers or {})})
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+
+        if self.http_cache is None or method.upper() != 'GET':
+            return self._request(method, url, **kwargs)
+
+        full_url = requests.Request(method, url, params=kwargs.get('params')).prepare().url
+        key = self.http_cache.key(full_url, self.headers.get('Authorization'))
+        if (cached := self.http_cache.get(key)) is not None:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), 'If-None-Match': cached['etag']}
+
+        response = self._request(method, url, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            self.stats.add(not_modified=1)
+            response.status_code = 200
+            response.reason = 'OK'
+            response._content = cached['content'].encode('utf-8')
+            response.encoding = 'utf-8'
+
+        elif response.status_code == 200 and response.headers.get('ETag'):
+            self.http_cache.put(key, response.headers['ETag'], response.content.decode('utf-8'))
+
+        return response
+
+    def _request(self, method, url, **kwargs) -> requests.Response:
+        (start, response, attempt) = (time.perf_counter(), None, 0)
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._sleep(self.rate_limiter.delay())
+                self.stats.add(requests=1, retries=int(attempt > 0))
+
+                try:
+                    response = super().request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    response = None
+                    if attempt == self.max_retries:
+                        raise
+                    self._sleep(backoff(attempt))
+                    continue
+
+                self.rate_limiter.update(response.headers)
+                delay = retry_delay(response.status_code, response.headers, attempt)
+                if delay is None or attempt == self.max_retries:
+                    return response
+
+                self._sleep(delay)
+
+        finally:
+            METRICS.record_request(endpoint(method, url, kwargs.get('json')),
+                                   time.perf_counter() - start,
+                                   response.status_code if response is not None else 0,
+                                   retries=attempt,
+                                   bytes_sent=size(kwargs.get('json') or kwargs.get('data')),
+                                   bytes_received=size(response.content)
+                                   if response is not None else 0)
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            self.stats.add(throttled_seconds=seconds)
+            time.sleep(seconds)
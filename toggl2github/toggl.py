@@ -1,14 +1,47 @@
 from __future__ import annotations
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
+import logging
 import re
-from typing import Any, Dict, List
-import requests
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from requests.auth import AuthBase
+
+from .cache import EntryStore
 from .config import get_config
+from .metrics import METRICS
+from .session import POOL_SIZE, TIMEOUT, Session
+
+if TYPE_CHECKING:
+    import pandas as pd
 
+LOG = logging.getLogger(__name__)
 API_ENDPOINT = 'https://api.track.toggl.com/api/v9'
 REPORTS_ENDPOINT = 'https://api.track.toggl.com/reports/api/v3'
 PAGE_SIZE = 1000
+LOOKBACK_DAYS = 7
+CONCURRENCY = 3
+
+
+def to_timestamp(iso: str) -> int:
+    """Converts an ISO 8601 timestamp to epoch seconds."""
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+def day_start(day: date) -> int:
+    """Epoch seconds at the start of `day` (UTC)."""
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def report_end_date() -> date:
+    """The last day to ask the reports api for when no end date is given. The api reads dates in
+    the user's timezone, which can be up to a day ahead of UTC, so tomorrow (UTC) is used to make
+    sure today's entries are included wherever the user is."""
+    return datetime.now(timezone.utc).date() + timedelta(days=1)
 
 
 def get_auth(user: str):
@@ -20,11 +53,31 @@ def get_auth(user: str):
     return b64encode(f'{user}:{toggl_password}'.encode()).decode('ascii')
 
 
+class TogglAuth(AuthBase):
+    """Signs each request with the current password of `user`, so a password changed in the
+    config or keyring is picked up by sessions that are already open."""
+
+    def __init__(self, user: str):
+        self.user = user
+
+    def __call__(self, request):
+        request.headers['Authorization'] = f'Basic {get_auth(self.user)}'
+        return request
+
+
+@lru_cache(maxsize=None)
+def get_session(user: str, pool_size=POOL_SIZE, timeout=TIMEOUT) -> Session:
+    """Returns the pooled session used for all Toggl requests made as `user`."""
+    session = Session(headers={'content-type': 'application/json'},
+                      pool_size=pool_size,
+                      timeout=timeout)
+    session.auth = TogglAuth(user)
+    return session
+
+
 def get_all_projects(workspace_id: int, user: str):
     return [Project(user, **r) for r in
-            requests.get(url=f'{API_ENDPOINT}/workspaces/{workspace_id}/projects',
-                         headers={'content-type': 'application/json',
-                                  'Authorization': f'Basic {get_auth(user)}'}).json()]
+            get_session(user).get(url=f'{API_ENDPOINT}/workspaces/{workspace_id}/projects').json()]
 
 
 def get_project(name: str, workspace_id: int, user: str):
@@ -32,8 +85,218 @@ def get_project(name: str, workspace_id: int, user: str):
                  if p.name.lower() == name.lower()), None)
 
 
+def fetch_project_entries(projects: List[Project], use_cache=True, lookback_days=LOOKBACK_DAYS,
+                          concurrency=CONCURRENCY):
+    """Gets the time entries of several projects in the same workspace with one set of report
+    queries and caches them on each project.
+
+    If `use_cache` is True, entries are kept in an `EntryStore` on disk and only the entries
+    since the last fetch (less `lookback_days`, to pick up entries that were edited or deleted
+    since) are downloaded from the reports api. Up to `concurrency` years are downloaded in
+    parallel; keep it low enough to stay within Toggl's rate limits.
+    """
+    if not projects:
+        return
+
+    fetch = IncrementalFetch(projects, use_cache, lookback_days)
+    (user, workspace_id) = (projects[0].user, projects[0].workspace_id)
+
+    start_date = fetch.start_date or get_created_at(user)
+    fetch.finish(start_date, get_records(workspace_id, user, fetch.project_ids, start_date,
+                                         report_end_date(), concurrency=concurrency))
+
+
+def get_created_at(user: str) -> date:
+    """The date the Toggl account was created, i.e. the earliest possible time entry."""
+    return datetime.fromisoformat(
+        get_session(user).get(f'{API_ENDPOINT}/me').json()['created_at']).date()
+
+
+class IncrementalFetch:
+    """Works out which window of entries needs downloading for a set of projects given what is
+    already in their `EntryStore`s, then merges the download into the stores and projects."""
+
+    def __init__(self, projects: List[Project], use_cache=True, lookback_days=LOOKBACK_DAYS):
+        self.projects = projects
+        self.lookback_days = lookback_days
+        self.fetched_at = datetime.now(timezone.utc)
+        self.stores = {p.id: EntryStore(p.workspace_id, p.id) if use_cache else None
+                       for p in projects}
+        self.cached = {p_id: store.load() if store is not None else (None, {})
+                       for p_id, store in self.stores.items()}
+
+    @property
+    def project_ids(self) -> List[int]:
+        return list(self.stores)
+
+    @property
+    def start_date(self) -> Optional[date]:
+        """The first day to download, or None if every entry must be downloaded."""
+        if any(watermark is None for watermark, _ in self.cached.values()):
+            return None
+
+        return (min(watermark for watermark, _ in self.cached.values())
+                - timedelta(days=self.lookback_days)).date()
+
+    def finish(self, start_date: date, new_records: Iterable[Dict[str, Any]]):
+        # Everything in the window is re-downloaded so entries deleted since are dropped
+        records = {p_id: {k: r for k, r in project_records.items()
+                          if r['start'][:10] < start_date.isoformat()}
+                   for p_id, (_, project_records) in self.cached.items()}
+
+        # Records without a project id can only be attributed when a single project was queried
+        default_id = self.projects[0].id if len(self.projects) == 1 else None
+        for r in new_records:
+            if (project_id := r.get('project_id', default_id)) in records:
+                records[project_id][str(r['id'])] = r
+            elif project_id is None:
+                LOG.debug(f'Skipping time entry {r.get("id")} - No project id')
+
+        for project in self.projects:
+            if self.stores[project.id] is not None:
+                self.stores[project.id].save(self.fetched_at, records[project.id])
+
+            project.invalidate()
+            project._entries = [Entry(**{'workspace_id': project.workspace_id,
+                                         'project_id': project.id,
+                                         **r})
+                                for r in records[project.id].values()]
+
+
+def report_windows(start_date: date, end_date: date) -> List[Tuple[date, date]]:
+    """Splits a date range into the per-year windows the reports api is queried with."""
+    return [(max(start_date, date(year, 1, 1)), min(end_date, date(year, 12, 31)))
+            for year in range(start_date.year, end_date.year+1)]
+
+
+def search_body(project_ids: List[int], start: date, end: date, i_page) -> Dict[str, Any]:
+    return {"end_date": end.isoformat(),
+            "start_date": start.isoformat(),
+            "page_size": PAGE_SIZE,
+            "project_ids": project_ids,
+            "first_row_number": PAGE_SIZE*i_page+1}
+
+
+def flatten_page(page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flattens a page of grouped report rows into one record per time entry."""
+    return [{**rec, **th} for rec in page for th in rec.pop('time_entries', [])]
+
+
+def iter_record_pages(workspace_id: int, user: str, project_ids: List[int], start_date: date,
+                      end_date: date) -> Iterator[List[Dict[str, Any]]]:
+    """Yields the raw time entries of `project_ids` between `start_date` and `end_date`
+    (inclusive) one page at a time, year by year, as the reports api returns them."""
+    session = get_session(user)
+    url = f'{REPORTS_ENDPOINT}/workspace/{workspace_id}/search/time_entries'
+
+    for (start, end) in report_windows(start_date, end_date):
+        for i_page in range(99999):
+            response = session.post(url, json=search_body(project_ids, start, end, i_page))
+
+            if response.status_code != 200:
+                raise Exception(f'Error: {response.status_code} - {response.text}')
+
+            if (records := flatten_page(response.json())) == []:
+                break
+
+            yield records
+
+
+def get_records(workspace_id: int, user: str, project_ids: List[int], start_date: date,
+                end_date: date, concurrency=CONCURRENCY) -> List[Dict[str, Any]]:
+    """Gets the raw time entries of `project_ids` between `start_date` and `end_date` (inclusive).
+    Each year is fetched one page at a time, with up to `concurrency` years fetched in parallel.
+    Records are returned in year order regardless of which year finishes first."""
+    def get_window(start: date, end: date) -> List[Dict[str, Any]]:
+        return [r for page in iter_record_pages(workspace_id, user, project_ids, start, end)
+                for r in page]
+
+    windows = report_windows(start_date, end_date)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(windows)))) as executor:
+        return [r for records in executor.map(lambda w: get_window(*w), windows)
+                for r in records]
+
+
+def summary_body(project_ids: List[int], start: date, end: date,
+                 description: str = None) -> Dict[str, Any]:
+    body = {"end_date": end.isoformat(),
+            "start_date": start.isoformat(),
+            "project_ids": project_ids,
+            "grouping": "projects",
+            "sub_grouping": "time_entries"}
+    if description is not None:
+        body["description"] = description
+    return body
+
+
+def add_summary(durations: Dict[int, Dict[str, int]], summary: Dict[str, Any]):
+    """Adds the seconds of each time entry group in a summary report to `durations`, which are
+    keyed by project id, then description."""
+    for group in summary.get('groups') or []:
+        project_durations = durations.setdefault(group['id'], {})
+        for sub_group in group.get('sub_groups') or []:
+            title = sub_group['title']
+            project_durations[title] = project_durations.get(title, 0) + sub_group['seconds']
+
+
+def get_summary_durations(workspace_id: int, user: str, project_ids: List[int],
+                          since: date = None, until: date = None,
+                          description: str = None) -> Dict[int, Dict[str, int]]:
+    """Gets the total duration (seconds) of each task from the summary reports api, which groups
+    entries server side, one request per year.
+
+    Parameters
+    ----------
+    since, until : date
+        The window to total (inclusive). Defaults to the account's creation up to
+        `report_end_date`
+    description : str
+        Only count entries whose description contains this
+
+    Returns
+    -------
+    Dict[int, Dict[str, int]]
+        Durations keyed by project id, then description
+    """
+    session = get_session(user)
+    url = f'{REPORTS_ENDPOINT}/workspace/{workspace_id}/summary/time_entries'
+    since = since or get_created_at(user)
+    until = until or report_end_date()
+
+    durations: Dict[int, Dict[str, int]] = {}
+    for (start, end) in report_windows(since, until):
+        response = session.post(url, json=summary_body(project_ids, start, end, description))
+
+        if response.status_code != 200:
+            raise Exception(f'Error: {response.status_code} - {response.text}')
+
+        add_summary(durations, response.json())
+
+    return durations
+
+
+def aggregate_entries(entries: Iterable[Entry]) -> Dict[str, TaskTotal]:
+    """Folds entries into per-task totals keyed by description, one entry at a time, so the
+    entries themselves never need to be held in memory."""
+    totals: Dict[str, TaskTotal] = {}
+    for entry in entries:
+        if (total := totals.get(entry.description)) is None:
+            total = totals[entry.description] = TaskTotal(entry.description)
+        total.add(entry)
+    return totals
+
+
 class Project:
-    def __init__(self, user, **kwargs):
+    __slots__ = ('id', 'workspace_id', 'client_id', 'name', 'is_private', 'active', 'at',
+                 'created_at', 'server_deleted_at', 'color', 'billable', 'template',
+                 'auto_estimates', 'estimated_hours', 'estimated_seconds', 'rate',
+                 'rate_last_updated', 'currency', 'recurring', 'template_id',
+                 'recurring_parameters', 'fixed_fee', 'actual_hours', 'actual_seconds',
+                 'start_date', 'status', 'wid', 'cid', 'guid', 'json', 'user', '_entries',
+                 '_tasks', '_task_index', '_frame')
+
+    def __init__(self, user, keep_json=False, **kwargs):
         self.id = kwargs.get('id', None)
         self.workspace_id = kwargs.get('workspace_id', None)
         self.client_id = kwargs.get('client_id', None)
@@ -63,84 +326,165 @@ class Project:
         self.wid = kwargs.get('wid', None)
         self.cid = kwargs.get('cid', None)
         self.guid = kwargs.get('guid', None)
-        self.json = kwargs
+        self.json = kwargs if keep_json else None
         self.user = user
+        self._entries: List[Entry] = None
+        self._tasks: Dict[str, Task] = None
+        self._task_index: Dict[str, Task] = None
+        self._frame: pd.DataFrame = None
 
     def __repr__(self) -> str:
         return f'<Project>: {self.name}'
 
     def get_task(self, name: str):
-        return next((t for t in self.tasks if t.description.lower() == name.lower()), None)
+        if self._task_index is None:
+            self._task_index = {}
+            for task in self._get_tasks().values():
+                self._task_index.setdefault(task.description.lower(), task)
+        return self._task_index.get(name.lower())
+
+    def invalidate(self):
+        """Clears the cached entries and tasks so the next access re-fetches them."""
+        self._entries = None
+        self._tasks = None
+        self._task_index = None
+        self._frame = None
 
     @property
     def entries(self) -> List[Entry]:
-
-        oldest_date = datetime.fromisoformat(requests.get(
-            f'{API_ENDPOINT}/me',
-            headers={'content-type': 'application/json',
-                     'Authorization': f'Basic {get_auth(self.user)}'})
-            .json()['created_at'])
-
-        def get_req(year, i_page) -> List[Dict[str, Any]]:
-            url = f'{REPORTS_ENDPOINT}/workspace/{self.workspace_id}/search/time_entries'
-            response = requests.post(url,
-                                     headers={'content-type': 'application/json',
-                                              'Authorization': f'Basic {get_auth(self.user)}'},
-                                     json={"end_date": f'{year}-12-31',
-                                           "start_date": f'{year}-01-01',
-                                           "page_size": PAGE_SIZE,
-                                           "project_ids": [self.id],
-                                           "first_row_number": PAGE_SIZE*i_page+1})
-
-            if response.status_code != 200:
-                raise Exception(f'Error: {response.status_code} - {response.text}')
-
-            return response.json()
-
-        records: List[Dict[str, Any]] = []
-        for year in range(oldest_date.year, datetime.now().year+1):
-            for i_page in range(99999):
-                new_records = [{**rec, **th}
-                               for rec in get_req(year, i_page)
-                               for th in rec.pop('time_entries', [])]
-
-                if new_records == []:
-                    break
-                else:
-                    records += new_records
-
-        return [Entry(workspace_id=r.pop('workspace_id', self.workspace_id),
-                      project_id=r.pop('project_id', self.id),
-                      **r) for r in records]
+        """The time entries of the project. Fetched on first access and cached until
+        `invalidate` or `fetch_entries` is called."""
+        if self._entries is None:
+            self.fetch_entries()
+        return self._entries
+
+    def fetch_entries(self, use_cache=True, lookback_days=LOOKBACK_DAYS,
+                      concurrency=CONCURRENCY) -> List[Entry]:
+        """Gets all the time entries of the project and caches them on the instance. See
+        `fetch_project_entries`."""
+        fetch_project_entries([self], use_cache, lookback_days, concurrency)
+        return self._entries
+
+    def iter_entries(self, start_date: date = None, end_date: date = None) -> Iterator[Entry]:
+        """Yields the project's entries page by page as the reports api returns them, bypassing
+        the on-disk cache and the entries cached on the instance. Defaults to everything from the
+        account's creation up to `report_end_date`."""
+        start_date = start_date or get_created_at(self.user)
+        end_date = end_date or report_end_date()
+
+        for page in iter_record_pages(self.workspace_id, self.user, [self.id], start_date,
+                                      end_date):
+            for r in page:
+                yield Entry(**{'workspace_id': self.workspace_id, 'project_id': self.id, **r})
 
     @property
     def tasks(self) -> List[Task]:
-        entries = self.entries
-        unique_names = set(e.description for e in entries)
-        return [Task([e for e in entries if e.description == name]) for name in unique_names]
+        return list(self._get_tasks().values())
+
+    def _get_tasks(self) -> Dict[str, Task]:
+        """Groups the entries into tasks by description in a single pass."""
+        if self._tasks is None:
+            groups: Dict[str, List[Entry]] = {}
+            for entry in self.entries:
+                groups.setdefault(entry.description, []).append(entry)
+            self._tasks = {name: Task(entries) for name, entries in groups.items()}
+        return self._tasks
+
+    def to_frame(self) -> pd.DataFrame:
+        """The entries as a table with one row per entry: `id`, `description` (categorical) and
+        `start`/`stop` as int64 epoch seconds (running entries stop now). Requires pandas."""
+        import numpy as np
+        import pandas as pd
+
+        if self._frame is None:
+            entries = self.entries
+            now = int(time.time())
+            self._frame = pd.DataFrame({
+                'id': [e.id for e in entries],
+                'description': pd.Categorical([e.description for e in entries]),
+                'start': np.fromiter((e.start_ts for e in entries), np.int64, len(entries)),
+                'stop': np.fromiter((now if e.stop_ts is None else e.stop_ts for e in entries),
+                                    np.int64, len(entries)),
+            })
+        return self._frame
+
+    def task_totals(self, since: date = None, until: date = None) -> pd.DataFrame:
+        """The total `duration` (seconds), first `start` and last `stop` (epoch seconds) of each
+        task, indexed by description. Only entries that start between `since` and `until`
+        (inclusive, UTC) are counted if given. Requires pandas."""
+        frame = self.to_frame()
+        if since is not None:
+            frame = frame[frame['start'] >= day_start(since)]
+        if until is not None:
+            frame = frame[frame['start'] < day_start(until + timedelta(days=1))]
+
+        return (frame.assign(duration=frame['stop'] - frame['start'])
+                .groupby('description', observed=True, sort=False)
+                .agg(duration=('duration', 'sum'), start=('start', 'min'), stop=('stop', 'max')))
+
+    def durations(self, since: date = None, until: date = None, summary=False,
+                  use_cache=True) -> Dict[str, int]:
+        """The total duration (seconds) of each task keyed by description.
+
+        Totals are added up from the entries that start between `since` and `until` (inclusive,
+        UTC) without pandas. If `summary` is True they come straight from the summary reports api
+        instead, which downloads a fraction of the data.
+
+        With `use_cache`, the entries are merged into the project's `EntryStore`, which needs them
+        all in memory. Without it, and if the entries haven't already been fetched, only the
+        window is downloaded and the pages are folded into the totals as they arrive, so memory
+        is bounded by the page size rather than the project's history.
+        """
+        if summary:
+            return get_summary_durations(self.workspace_id, self.user, [self.id],
+                                         since, until).get(self.id, {})
+
+        if not use_cache and self._entries is None:
+            entries = self.iter_entries(since, until)
+        else:
+            entries = self.entries
+
+        start = day_start(since) if since is not None else None
+        stop = day_start(until + timedelta(days=1)) if until is not None else None
+
+        with METRICS.phase('group'):
+            totals = aggregate_entries(e for e in entries
+                                       if (start is None or e.start_ts >= start)
+                                       and (stop is None or e.start_ts < stop))
+
+        return {description: total.duration for description, total in totals.items()}
 
 
 class Entry:
-    def __init__(self, **kwargs):
+    """A single time entry. Timestamps (`start_ts`, `stop_ts`, `at`, `server_deleted_at`) are
+    stored as epoch seconds; `start` and `stop` return them as UTC datetimes. The raw record is
+    only kept in `json` if `keep_json` is True."""
+    __slots__ = ('id', 'workspace_id', 'project_id', 'billable', 'start_ts', 'stop_ts',
+                 'description', 'tags', 'tag_ids', 'duronly', 'at', 'server_deleted_at', 'user_id',
+                 'uid', 'wid', 'pid', 'json')
+
+    def __init__(self, keep_json=False, **kwargs):
         self.id = kwargs.get('id', None)
         self.workspace_id = kwargs.get('workspace_id', None)
         self.project_id = kwargs.get('project_id', None)
         self.billable = kwargs.get('billable', None)
-        self.start = datetime.fromisoformat(kwargs.get('start', None))
-        self.stop = (datetime.fromisoformat(kwargs.get('stop', None))
-                     if kwargs.get('stop', None)
-                     else datetime.now(timezone.utc))
-        self.description = kwargs.get('description', None)
+        self.start_ts = to_timestamp(kwargs.get('start', None))
+        self.stop_ts = to_timestamp(kwargs['stop']) if kwargs.get('stop', None) else None
+        # Descriptions repeat across the entries of a task so only one copy of each is kept
+        self.description = (sys.intern(kwargs['description'])
+                            if isinstance(kwargs.get('description', None), str)
+                            else kwargs.get('description', None))
         self.tags = kwargs.get('tags', None)
         self.tag_ids = kwargs.get('tag_ids', None)
         self.duronly = kwargs.get('duronly', None)
-        self.at = kwargs.get('at', None)
-        self.server_deleted_at = kwargs.get('server_deleted_at', None)
+        self.at = to_timestamp(kwargs['at']) if kwargs.get('at', None) else None
+        self.server_deleted_at = (to_timestamp(kwargs['server_deleted_at'])
+                                  if kwargs.get('server_deleted_at', None) else None)
         self.user_id = kwargs.get('user_id', None)
         self.uid = kwargs.get('uid', None)
         self.wid = kwargs.get('wid', None)
         self.pid = kwargs.get('pid', None)
-        self.json = kwargs
+        self.json = kwargs if keep_json else None
 
     def __repr__(self) -> str:
         return f'<Entry>: {self.description} | {self.start.date()} - {self.stop.date()} | {self.duration/3600:.1f} hrs'
@@ -151,36 +495,48 @@ class Entry:
     def __eq__(self, other: Entry) -> bool:
         return self.id == other.id
 
+    @property
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(self.start_ts, timezone.utc)
+
+    @property
+    def stop(self) -> datetime:
+        """When the entry stopped, or now if it is still running."""
+        return datetime.fromtimestamp(self.stop_time, timezone.utc)
+
+    @property
+    def stop_time(self) -> int:
+        return self.stop_ts if self.stop_ts is not None else int(time.time())
+
     @property
     def duration(self) -> int:
-        return int((self.stop - self.start).total_seconds())
+        return self.stop_time - self.start_ts
 
 
 class Task:
+    """The entries of a project that share a description. Other attributes (`id`, `tags`, etc.)
+    are those of the first entry."""
+    __slots__ = ('entries', 'description')
+
+    FIRST_ENTRY_ATTRIBUTES = ('id', 'workspace_id', 'project_id', 'billable', 'tags', 'tag_ids',
+                              'duronly', 'at', 'server_deleted_at', 'user_id', 'uid', 'wid', 'pid')
+
     def __init__(self, entries: List[Entry]):
         self.entries = entries
-        self.id = entries[0].id
-        self.workspace_id = entries[0].workspace_id
-        self.project_id = entries[0].project_id
-        self.billable = entries[0].billable
         self.description: str = entries[0].description
-        self.tags = entries[0].tags
-        self.tag_ids = entries[0].tag_ids
-        self.duronly = entries[0].duronly
-        self.at = entries[0].at
-        self.server_deleted_at = entries[0].server_deleted_at
-        self.user_id = entries[0].user_id
-        self.uid = entries[0].uid
-        self.wid = entries[0].wid
-        self.pid = entries[0].pid
+
+    def __getattr__(self, name):
+        if name in Task.FIRST_ENTRY_ATTRIBUTES:
+            return getattr(self.entries[0], name)
+        raise AttributeError(f"'Task' object has no attribute '{name}'")
 
     @property
     def start(self) -> datetime:
-        return min(e.start for e in self.entries)
+        return datetime.fromtimestamp(min(e.start_ts for e in self.entries), timezone.utc)
 
     @property
     def stop(self) -> datetime:
-        return max(e.stop for e in self.entries if e.stop is not None)
+        return datetime.fromtimestamp(max(e.stop_time for e in self.entries), timezone.utc)
 
     @property
     def duration(self) -> int:
@@ -188,3 +544,24 @@ class Task:
 
     def __repr__(self) -> str:
         return f'<Task>: {self.description} | {self.start.date()} - {self.stop.date()} | {self.duration/3600:.1f} hrs'
+
+
+class TaskTotal:
+    """Running totals of the entries of a task: total `duration` (seconds) and first `start` /
+    last `stop` (epoch seconds)."""
+    __slots__ = ('description', 'duration', 'start', 'stop')
+
+    def __init__(self, description: str):
+        self.description = description
+        self.duration = 0
+        self.start: int = None
+        self.stop: int = None
+
+    def __repr__(self) -> str:
+        return f'<TaskTotal>: {self.description} | {self.duration/3600:.1f} hrs'
+
+    def add(self, entry: Entry):
+        stop = entry.stop_time
+        self.duration += stop - entry.start_ts
+        self.start = entry.start_ts if self.start is None else min(self.start, entry.start_ts)
+        self.stop = stop if self.stop is None else max(self.stop, stop)
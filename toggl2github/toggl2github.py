@@ -1,54 +1,284 @@
 
+import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 
-import pandas as pd
-
-from toggl2github.githubpy import get_project_issues, set_field_value
-from toggl2github.toggl import get_project
+from toggl2github.githubpy import ProjectContext, set_field_values
+from toggl2github.toggl import fetch_project_entries, get_all_projects, get_project
+from toggl2github.toggl import Project, get_summary_durations
 
 from .config import get_config
+from .metrics import METRICS
 
 LOG = logging.getLogger(__name__)
+SYNC_CONCURRENCY = 4
+PLAN_VERSION = 1
+RE_TASK = re.compile(r'#(\d+) (.+)', re.I)
+
+
+def index_issues(issues: Iterable[dict]) -> Dict[Tuple[int, str], dict]:
+    """Indexes issues by (number, lower-cased title). The first issue wins if a key is repeated."""
+    index = {}
+    for issue in issues:
+        if issue.get('Number') is not None and isinstance(issue.get('Title'), str):
+            index.setdefault((issue['Number'], issue['Title'].lower()), issue)
+    return index
+
+
+def index_matching_issues(issues: Iterable[dict],
+                          durations: Mapping[str, int]) -> Dict[Tuple[int, str], dict]:
+    """Same as `index_issues`, but only the issues that match one of the tasks in `durations` are
+    kept, so `issues` can be streamed page by page with memory bounded by the tasks rather than
+    the size of the project."""
+    keys = {(int(match.group(1)), match.group(2).lower())
+            for description in durations if (match := RE_TASK.match(description or ''))}
+    return index_issues(issue for issue in issues
+                        if isinstance(issue.get('Title'), str)
+                        and (issue.get('Number'), issue['Title'].lower()) in keys)
+
+
+def match_tasks(durations: Mapping[str, int],
+                issues: Dict[Tuple[int, str], dict]) -> Iterator[Tuple[str, int, Optional[dict]]]:
+    """Yields the title, duration and matching issue (None if there isn't one) of each task named
+    `#<number> <title>`. `durations` are the task durations (seconds) keyed by description."""
+    for description, duration in durations.items():
+        if (match := RE_TASK.match(description or '')):
+            desc = match.group(2)
+            yield desc, duration, issues.get((int(match.group(1)), desc.lower()))
 
 
-def sync(toggl_project_name: str, github_project_number: int):
+def sync(toggl_project_name: str, github_project_number: int, since: date = None,
+         until: date = None, summary=False, refresh_metadata=False, plan_file: Path = None,
+         use_cache=True):
     """For each task in the Toggl project that has a name identical an issue in the  Github project 
-    sets the `time spent` field of the Github issue to the duration of the task."""
+    sets the `time spent` field of the Github issue to the duration of the task.
+
+    Only time between `since` and `until` (inclusive) is counted if given. If `summary` is True the
+    durations are taken from the Toggl summary report rather than totalled from every entry.
+    If `refresh_metadata` is True the stored Github project metadata is downloaded again.
+    If `plan_file` is given nothing is changed in Github. Instead the changes are written to
+    `plan_file` to be made later by `apply_plan`. If `use_cache` is False the Toggl entries are
+    streamed into the totals instead of being kept on disk (see `Project.durations`).
+    """
 
     (workspace_id, toggl_user, gh_user, gh_token) = get_config(['toggl_workspace_id',
                                                                 'toggl_user',
                                                                 'gh_user',
                                                                 'gh_token']).values()
 
-    toggl_project = get_project(toggl_project_name, workspace_id, toggl_user)
-    df_gh = pd.DataFrame.from_records(get_project_issues(gh_user,
-                                                         gh_token,
-                                                         github_project_number))
+    with METRICS.phase('toggl.project'):
+        toggl_project = get_project(toggl_project_name, workspace_id, toggl_user)
+
+    with METRICS.phase('toggl.durations'):
+        durations = toggl_project.durations(since, until, summary, use_cache)
+
+    if plan_file is None:
+        update_time_spent(durations, gh_user, gh_token, github_project_number, refresh_metadata)
+    else:
+        plan = plan_time_spent(durations, gh_user, gh_token, github_project_number,
+                               refresh_metadata)
+        plan['toggl_project_name'] = toggl_project_name
+        save_plan(plan, plan_file)
+
+
+def update_time_spent(durations: Mapping[str, int], gh_user: str, gh_token: str,
+                      github_project_number: int, refresh_metadata=False):
+    """Sets the `time spent` field of each issue in the Github project that is assigned only to
+    `gh_user` and matches one of the tasks in `durations` (seconds keyed by description)."""
+    context = ProjectContext(gh_user, gh_token, github_project_number,
+                             refresh_metadata=refresh_metadata)
+    with METRICS.phase('github.issues'):
+        issues = index_matching_issues(context.iter_issues(), durations)
+
+    with METRICS.phase('match'):
+        (updates, descriptions, n_unchanged) = plan_updates(durations, issues, gh_user)
+
+    with METRICS.phase('github.update'):
+        errors = set_field_values(gh_user, gh_token, github_project_number, updates,
+                                  context=context)
+    log_results(descriptions, errors, n_unchanged)
+
+
+def plan_time_spent(durations: Mapping[str, int], gh_user: str, gh_token: str,
+                    github_project_number: int, refresh_metadata=False) -> Dict[str, Any]:
+    """Works out the changes `update_time_spent` would make without making them.
+
+    The plan lists the item, field, old value and new value of each change, along with the node id
+    and fields of the Github project so that `apply_plan` doesn't have to download anything.
+    """
+    context = ProjectContext(gh_user, gh_token, github_project_number,
+                             refresh_metadata=refresh_metadata)
+    with METRICS.phase('github.issues'):
+        issues = index_matching_issues(context.iter_issues(), durations)
+
+    with METRICS.phase('match'):
+        (updates, descriptions, n_unchanged) = plan_updates(durations, issues, gh_user)
+
+    old_values = {issue['id']: issue for issue in issues.values()}
+    changes = [{'item': item_id, 'task': desc, 'field': field_name, 'type': field_type,
+                'old': old_values[item_id].get(field_name), 'new': value}
+               for (item_id, field_name, field_type, value), desc in zip(updates, descriptions)]
+
+    return {'version': PLAN_VERSION,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'gh_user': gh_user,
+            'github_project_number': github_project_number,
+            'project_id': context.project_id,
+            'fields': context.fields,
+            'unchanged': n_unchanged,
+            'changes': changes}
+
+
+def save_plan(plan: Dict[str, Any], plan_file: Path):
+    Path(plan_file).write_text(json.dumps(plan, indent=4))
+    LOG.info(f'Planned {len(plan["changes"])} changes to Github project '
+             f'{plan["github_project_number"]}, written to {plan_file}')
+
+
+def apply_plan(plan_file: Path):
+    """Makes the changes in a plan written by `sync` with a `plan_file`, without downloading
+    anything from Toggl or Github. The old values in the plan are not checked against Github, so
+    changes made since the plan was written are overwritten."""
+    plan = json.loads(Path(plan_file).read_text())
+    if plan.get('version') != PLAN_VERSION:
+        raise Exception(f'{plan_file} is not a version {PLAN_VERSION} plan')
+
+    (gh_user, gh_token) = get_config(['gh_user', 'gh_token']).values()
+    if plan['gh_user'] != gh_user:
+        raise Exception(f'{plan_file} was planned for Github user {plan["gh_user"]}, not {gh_user}')
+
+    context = ProjectContext.from_metadata(gh_user, gh_token, plan['github_project_number'],
+                                           plan['project_id'], plan['fields'])
+    changes = plan['changes']
+    with METRICS.phase('github.update'):
+        errors = set_field_values(gh_user, gh_token, plan['github_project_number'],
+                                  [(c['item'], c['field'], c['type'], c['new']) for c in changes],
+                                  context=context)
+    log_results([c['task'] for c in changes], errors, plan['unchanged'])
+
 
-    for num, desc, dur in [(int(match.group(1)), match.group(2), task.duration)
-                           for task in toggl_project.tasks
-                           if (match := re.match(r'#(\d+) (.+)', task.description, re.I))]:
-        df = df_gh[(df_gh['Number'] == num) & (df_gh['Title'].str.lower() == desc.lower())]
+def plan_updates(durations: Mapping[str, int],
+                 issues: Dict[Tuple[int, str], dict],
+                 gh_user: str) -> Tuple[List[Tuple[str, str, str, int]], List[str], int]:
+    """Works out which `time spent` fields need to change.
 
-        if df.empty:
+    Returns
+    -------
+    Tuple[List[Tuple[str, str, str, int]], List[str], int]
+        The updates to pass to `set_field_values`, the task title of each update and the number of
+        matched issues that are already up to date
+    """
+    (updates, descriptions, n_unchanged) = ([], [], 0)
+    for desc, dur, issue in match_tasks(durations, issues):
+
+        if issue is None:
             LOG.info(f'No issue found for {desc}')
 
-        elif 'Assignees' not in df.columns:
+        elif 'Assignees' not in issue:
             LOG.info(f'Skipping {desc} - No assignees metadata')
 
-        elif gh_user in df['Assignees'].values[0] and len(df['Assignees'].values[0]) > 1:
+        elif gh_user in issue['Assignees'] and len(issue['Assignees']) > 1:
             LOG.info(f'Skipping {desc} - More than one person is assigned')
 
-        elif gh_user not in df['Assignees'].values[0]:
+        elif gh_user not in issue['Assignees']:
             LOG.info(f'Skipping {desc} - Not assigned to {gh_user}')
 
+        elif issue.get('Time Spent') == round(dur/3600):
+            LOG.debug(f'Skipping {desc} - Time spent is unchanged')
+            n_unchanged += 1
+
         else:
             LOG.info(f'{desc} - {dur/3600:.1f} hours')
-            set_field_value(gh_user,
-                            gh_token,
-                            github_project_number,
-                            df['Title'].values[0],
-                            'Time Spent',
-                            'number',
-                            round(dur/3600))
+            updates.append((issue['id'], 'Time Spent', 'number', round(dur/3600)))
+            descriptions.append(desc)
+
+    return updates, descriptions, n_unchanged
+
+
+def log_results(descriptions: List[str], errors: List[Optional[str]], n_unchanged: int):
+    for desc, error in zip(descriptions, errors):
+        if error is not None:
+            LOG.warning(f'Failed to update {desc} - {error}')
+
+    LOG.info(f'Updated {len(descriptions) - sum(e is not None for e in errors)} issues, '
+             f'skipped {n_unchanged} unchanged')
+
+
+def load_mapping(mapping_file: Path) -> Dict[str, List[int]]:
+    """Loads a JSON or YAML file mapping Toggl project names to one or more Github project
+    numbers, e.g. `{"NNL": 1, "Website": [2, 3]}`."""
+    mapping_file = Path(mapping_file)
+    with mapping_file.open('r') as f:
+        if mapping_file.suffix.lower() in ['.yml', '.yaml']:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('PyYAML is required to read yaml mapping files: '
+                                  'pip install toggl2github[yaml]')
+            mapping = yaml.safe_load(f)
+        else:
+            mapping = json.load(f)
+
+    if not isinstance(mapping, dict):
+        raise ValueError(f'{mapping_file} must map Toggl project names to Github project numbers')
+
+    return {name: [int(n) for n in (numbers if isinstance(numbers, list) else [numbers])]
+            for name, numbers in mapping.items()}
+
+
+def resolve_mapping(mapping: Dict[str, List[int]], workspace_id: int,
+                    toggl_user: str) -> List[Tuple[Project, int]]:
+    """Pairs each Toggl project in `mapping` with each of its Github project numbers, with one
+    request for all the Toggl projects. Projects that can't be found are logged and skipped."""
+    projects = {}
+    for project in get_all_projects(workspace_id, toggl_user):
+        projects.setdefault(project.name.lower(), project)
+
+    for name in [n for n in mapping if n.lower() not in projects]:
+        LOG.warning(f'Toggl project {name} not found')
+
+    return [(projects[name.lower()], number)
+            for name, numbers in mapping.items() if name.lower() in projects
+            for number in numbers]
+
+
+def sync_all(mapping_file: Path, concurrency=SYNC_CONCURRENCY, since: date = None,
+             until: date = None, summary=False, refresh_metadata=False):
+    """Syncs every Toggl project in `mapping_file` with its Github project(s). Toggl entries (or, if
+    `summary` is True, summary totals) for all the projects are fetched together, then up to
+    `concurrency` Github projects are updated at once. See `sync` for the other arguments."""
+    mapping = load_mapping(mapping_file)
+
+    (workspace_id, toggl_user, gh_user, gh_token) = get_config(['toggl_workspace_id',
+                                                                'toggl_user',
+                                                                'gh_user',
+                                                                'gh_token']).values()
+
+    with METRICS.phase('toggl.project'):
+        pairs = resolve_mapping(mapping, workspace_id, toggl_user)
+
+    unique = list({p.id: p for p, _ in pairs}.values())
+    with METRICS.phase('toggl.durations'):
+        if summary:
+            totals = get_summary_durations(workspace_id, toggl_user, [p.id for p in unique],
+                                           since, until)
+            durations = {p.id: totals.get(p.id, {}) for p in unique}
+        else:
+            fetch_project_entries(unique)
+            durations = {p.id: p.durations(since, until) for p in unique}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(update_time_spent, durations[project.id], gh_user, gh_token,
+                                   number, refresh_metadata):
+                   (project, number) for project, number in pairs}
+
+        for future in as_completed(futures):
+            (project, number) = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                LOG.error(f'Failed to sync {project.name} with Github project {number} - {e}')